@@ -0,0 +1,73 @@
+"""
+Single entry point for the DesignQA pipeline.
+
+    python cli.py extract      # PDF -> raw extracted rules
+    python cli.py structure    # raw rules -> columnar rule store (+ --excel)
+    python cli.py ingest       # rule store -> Neo4j / embedded SQLite graph
+    python cli.py benchmark    # run all DesignQA subsets against the VLLM server
+    python cli.py score        # score predictions/*.csv in the official results.txt layout
+    python cli.py query V.1.2  # look up a rule (or --term) in the knowledge graph
+
+Only argparse is imported up front; each command imports its module (and with it
+pandas, neo4j, openai, PIL, ...) when it runs, and ./config/.env is read on first use.
+"""
+import sys
+import argparse
+
+# command -> (module, function adding its arguments, function running it, help)
+COMMANDS = {
+    "extract": ("main", "add_extract_arguments", "run_extract", "Extract the rules from the FSAE PDF."),
+    "structure": ("main", "add_structure_arguments", "run_structure", "Build the rule store from the extracted rules."),
+    "ingest": ("main_graph", "add_arguments", "main", "Load the rule store into the knowledge graph."),
+    "benchmark": ("run_benchmark", "add_arguments", "main", "Generate predictions for every DesignQA subset."),
+    "score": ("src.evaluation.scorer", "add_arguments", "main", "Score the predictions in-process."),
+    "query": ("cli", "add_query_arguments", "run_query", "Look up a rule or term in the knowledge graph."),
+}
+
+def add_query_arguments(parser):
+    parser.add_argument("rule_id", nargs="?", help="Rule number to fetch, e.g. V.1.2.")
+    parser.add_argument("--term", help="Return every rule mentioning this term instead.")
+
+def run_query(args):
+    from src.config import get_rag_config
+    from src.rag_query.rag_query_client import RAGQueryClient
+
+    if not args.rule_id and not args.term:
+        print("Error: give a rule number or --term.")
+        return
+    client = RAGQueryClient(get_rag_config())
+    try:
+        if args.term:
+            print(client._get_rules_by_term(args.term))
+        else:
+            print(client._get_rule_from_kg(args.rule_id, "state exactly"))
+    finally:
+        client.close()
+
+def build_parser(command=None):
+    """Builds the CLI parser; only the selected command's module is imported."""
+    parser = argparse.ArgumentParser(prog="cli.py", description="DesignQA RAG pipeline.")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    for name, (module_name, add_arguments, _, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text, description=help_text)
+        if name == command:
+            getattr(_load(module_name), add_arguments)(subparser)
+    return parser
+
+def _load(module_name):
+    import importlib
+    return sys.modules[__name__] if module_name == "cli" else importlib.import_module(module_name)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    command = next((arg for arg in argv if not arg.startswith("-")), None)
+    parser = build_parser(command if command in COMMANDS else None)
+    args = parser.parse_args(argv)
+    if not args.command:
+        parser.print_help()
+        return
+    module_name, _, run, _ = COMMANDS[args.command]
+    getattr(_load(module_name), run)(args)
+
+if __name__ == "__main__":
+    main()
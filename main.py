@@ -1,19 +1,64 @@
-from src.parsing.extract_rules_from_pdf import extract_rules_from_pdf
-from src.parsing.structred_excel_files import create_structured_excel_files
-import pandas as pd
 from pathlib import Path
-import openpyxl
+import argparse
+import time
+
+PDF_PATH = "design_qa/dataset/docs/FSAE_Rules_2024_V1.pdf"
+
+def add_extract_arguments(parser):
+    parser.add_argument("--pdf", default=PDF_PATH, help="FSAE rules PDF to extract.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processes used to scan pages (default: one per CPU).")
+
+def add_structure_arguments(parser):
+    parser.add_argument("--excel", action="store_true",
+                        help="Also write the human-readable per-category Excel files.")
+
+def extract_rules(pdf_path=PDF_PATH, workers=None):
+    """Step 1: Extract rules from the PDF."""
+    from src.parsing.extract_rules_from_pdf import extract_rules_from_pdf
 
-if __name__ == "__main__":
-    
-    # Step 1: Extract rules from the PDF
     print("Step 1: Extracting rules from PDF...")
-    pdf_path = "design_qa/dataset/docs/FSAE_Rules_2024_V1.pdf"
-    all_rules_df, category_titles_map = extract_rules_from_pdf(pdf_path)
-    print(f"Extraction complete. Found {len(all_rules_df)} total rules.")
-
-    # Step 2: Structure the extracted rules into categorized Excel files
-    print("\nStep 2: Structuring rules into categorized Excel files...")
-    create_structured_excel_files(all_rules_df, category_titles_map)
-    #create_excel_with_formatted_text(all_rules_df, category_titles_map)
-    print("\nProcessing complete.")
\ No newline at end of file
+    start_time = time.perf_counter()
+    all_rules_df, category_titles_map = extract_rules_from_pdf(pdf_path, workers=workers)
+    print(f"Extraction complete. Found {len(all_rules_df)} total rules in {time.perf_counter() - start_time:.2f}s.")
+    return all_rules_df, category_titles_map
+
+def structure_rules(all_rules_df, category_titles_map, excel=False):
+    """Step 2: Structure the extracted rules into the columnar rule store (and optionally Excel)."""
+    from src.parsing.rule_store import build_rule_table, write_rule_store, RULE_STORE_PATH
+
+    print(f"\nStep 2: Writing the structured rule store to {RULE_STORE_PATH}...")
+    write_rule_store(build_rule_table(all_rules_df, category_titles_map), RULE_STORE_PATH)
+
+    # Optional: Human-readable Excel side output
+    if excel:
+        from src.parsing.structred_excel_files import create_structured_excel_files
+
+        print("\nStructuring rules into categorized Excel files...")
+        create_structured_excel_files(all_rules_df, category_titles_map)
+        #create_excel_with_formatted_text(all_rules_df, category_titles_map)
+
+def run_extract(args):
+    """CLI `extract`: PDF -> raw extracted rules file."""
+    from src.parsing.rule_store import write_extracted_rules
+
+    all_rules_df, category_titles_map = extract_rules(args.pdf, args.workers)
+    write_extracted_rules(all_rules_df, category_titles_map)
+
+def run_structure(args):
+    """CLI `structure`: raw extracted rules file -> rule store (+ Excel)."""
+    from src.parsing.rule_store import read_extracted_rules
+
+    all_rules_df, category_titles_map = read_extracted_rules()
+    structure_rules(all_rules_df, category_titles_map, excel=args.excel)
+    print("\nProcessing complete.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract the FSAE rules from the PDF into the structured rule store.")
+    add_extract_arguments(parser)
+    add_structure_arguments(parser)
+    args = parser.parse_args()
+
+    all_rules_df, category_titles_map = extract_rules(args.pdf, args.workers)
+    structure_rules(all_rules_df, category_titles_map, excel=args.excel)
+    print("\nProcessing complete.")
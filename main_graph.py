@@ -1,34 +1,136 @@
 import os
 import glob
-from src.graph.kg_ingestion import Neo4jUploader, NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD
+import time
+import argparse
+from src.config import get_neo4j_credentials, get_rag_config
+from src.graph.kg_ingestion import (
+    Neo4jUploader, read_rulebook_records, read_rule_store_records, parse_rulebooks_parallel,
+    sheets_from_records, DEFAULT_BATCH_SIZE, DEFAULT_WRITE_WORKERS
+)
+from src.parsing.rule_store import RULE_STORE_PATH
 
-def run_ingestion():
+# Directory where the Excel rulebooks are stored
+DATA_DIRECTORY = './structured_rules/'
+DEFAULT_SQLITE_PATH = './structured_rules/rules.sqlite'
+
+def load_rule_records(source="auto"):
+    """Reads every rule as flat hashed records from the rule store or the Excel rulebooks."""
+    if source == "store" or (source == "auto" and RULE_STORE_PATH.exists()):
+        print(f"Reading rules from the rule store '{RULE_STORE_PATH}'...")
+        return read_rule_store_records(RULE_STORE_PATH)
+    excel_files = glob.glob(os.path.join(DATA_DIRECTORY, "*.xlsx"))
+    print(f"Reading rules from {len(excel_files)} Excel rulebooks...")
+    return [record for file_path in excel_files for record in read_rulebook_records(file_path)]
+
+def run_embedded_ingestion(sqlite_path, source="auto"):
     """
-    Finds all Excel rulebooks and orchestrates the upload process to Neo4j.
+    Builds the embedded SQLite knowledge graph (no Neo4j server needed) from the same parsed rules.
+    Rules stored by an earlier run that are no longer in the source are deleted.
+    """
+    from src.graph.sqlite_backend import SQLiteBackend
+
+    records = load_rule_records(source)
+    if not records:
+        # Without a source every stored rule would count as stale and be deleted.
+        print(f" Warning: No Excel files (.xlsx) were found in the '{DATA_DIRECTORY}' directory.")
+        print("Please check the path and make sure your rulebooks are there.")
+        return
+    backend = SQLiteBackend(sqlite_path)
+    backend.upsert_rules(records)
+    removed = sorted(set(backend.all_rules()) - {r['rule_id'] for r in records})
+    backend.delete_rules(removed)
+    backend.close()
+    print(f"\n🚀 {len(records)} rules written to the embedded knowledge graph '{sqlite_path}' "
+          f"({len(removed)} stale rules removed).")
+
+def run_ingestion(batch_size=DEFAULT_BATCH_SIZE, batched=True, sync=False, source="auto",
+                  parallel=False, parse_workers=None, write_workers=DEFAULT_WRITE_WORKERS):
+    """
+    Orchestrates the upload process to Neo4j, reading the columnar rule store
+    (or, with source="excel" or when no store exists, the Excel rulebooks).
+    With `parallel=True` the Excel files are parsed in a process pool and all rulebooks
+    are written through `write_workers` concurrent transactions (nodes first, then links).
     """
     # First, check if the required credentials were loaded successfully
+    NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD = get_neo4j_credentials()
     if not all([NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD]):
         print(" Error: Neo4j credentials not found in ./config/.env file!")
         print("Please ensure the file exists and contains the correct variables.")
         return
 
-    uploader = Neo4jUploader(NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD)
+    uploader = Neo4jUploader(NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD, batch_size=batch_size)
+    # Constraints must exist before the first MERGE so it becomes an index seek
+    uploader.ensure_schema()
+
+    if source == "store" or (source == "auto" and RULE_STORE_PATH.exists()):
+        print(f"Reading rules from the rule store '{RULE_STORE_PATH}'...")
+        if sync:
+            uploader.sync_rules(read_rule_store_records(RULE_STORE_PATH))
+        elif parallel:
+            start_time = time.perf_counter()
+            books = sheets_from_records(read_rule_store_records(RULE_STORE_PATH))
+            print(f"Read {len(books)} rulebooks in {time.perf_counter() - start_time:.2f}s.")
+            sources = {
+                name: ([record for rows in levels.values() for record in rows], 0.0)
+                for name, levels in books.items()
+            }
+            uploader.upload_parallel(sources, write_workers=write_workers)
+        else:
+            uploader.upload_rule_store(RULE_STORE_PATH, batched=batched)
+        uploader.close()
+        print("\n🚀 All rulebooks have been processed.")
+        return
     
-    # Define the directory where your Excel files are stored
-    data_directory = './structured_rules/'
-    excel_files = glob.glob(os.path.join(data_directory, "*.xlsx"))
+    excel_files = glob.glob(os.path.join(DATA_DIRECTORY, "*.xlsx"))
     
     if not excel_files:
-        print(f" Warning: No Excel files (.xlsx) were found in the '{data_directory}' directory.")
+        print(f" Warning: No Excel files (.xlsx) were found in the '{DATA_DIRECTORY}' directory.")
         print("Please check the path and make sure your rulebooks are there.")
+    elif sync:
+        print(f"Found {len(excel_files)} rulebooks to sync...")
+        records = [record for file_path in excel_files for record in read_rulebook_records(file_path)]
+        uploader.sync_rules(records)
+    elif parallel:
+        print(f"Found {len(excel_files)} rulebooks to process in parallel...")
+        uploader.upload_parallel(parse_rulebooks_parallel(excel_files, parse_workers), write_workers=write_workers)
     else:
         print(f"Found {len(excel_files)} rulebooks to process...")
         for file_path in excel_files:
-            uploader.upload_rulebook_from_excel(file_path)
+            uploader.upload_rulebook_from_excel(file_path, batched=batched)
     
     uploader.close()
     print("\n🚀 All rulebooks have been processed.")
 
+def add_arguments(parser):
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Rows per UNWIND transaction in batched mode.")
+    parser.add_argument("--row-by-row", action="store_true",
+                        help="Use the original one-query-per-row ingestion path (for comparison).")
+    parser.add_argument("--sync", action="store_true",
+                        help="Only upsert rules whose content hash changed and delete removed rules.")
+    parser.add_argument("--source", choices=["auto", "store", "excel"], default="auto",
+                        help="Read the columnar rule store or the Excel files (auto: store if present).")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Parse the rulebooks in a process pool and upload them through concurrent write transactions.")
+    parser.add_argument("--parse-workers", type=int, default=None,
+                        help="Processes used to parse Excel files in --parallel mode (default: CPU count).")
+    parser.add_argument("--write-workers", type=int, default=DEFAULT_WRITE_WORKERS,
+                        help="Concurrent Neo4j write transactions in --parallel mode.")
+    parser.add_argument("--backend", choices=["neo4j", "sqlite"], default="neo4j",
+                        help="Target knowledge graph: a Neo4j server or the embedded SQLite store.")
+    parser.add_argument("--sqlite-path", default=None,
+                        help="Database file for --backend sqlite (default: KG_SQLITE_PATH or ./structured_rules/rules.sqlite).")
+
+def main(args):
+    if args.backend == "sqlite":
+        sqlite_path = args.sqlite_path or get_rag_config()["KG_SQLITE_PATH"] or DEFAULT_SQLITE_PATH
+        run_embedded_ingestion(sqlite_path, source=args.source)
+    else:
+        run_ingestion(batch_size=args.batch_size, batched=not args.row_by_row, sync=args.sync, source=args.source,
+                      parallel=args.parallel, parse_workers=args.parse_workers, write_workers=args.write_workers)
+
 if __name__ == "__main__":
-    # This block executes when you run `python main.py` from your root directory
-    run_ingestion()
\ No newline at end of file
+    # This block executes when you run `python main_graph.py` from your root directory
+    parser = argparse.ArgumentParser(description="Ingest the structured rulebooks into Neo4j.")
+    add_arguments(parser)
+    main(parser.parse_args())
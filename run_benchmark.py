@@ -1,13 +1,31 @@
 import os
-import pandas as pd
+import json
+import time
+import argparse
 import re
-from tqdm import tqdm
-from src.rag_query.rag_query_client import RAGQueryClient, RAG_CONFIG
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.config import get_rag_config
+from src.rag_query.rag_query_client import RAGQueryClient, missing_config, shared_preamble
+from src.rag_query.request_policy import RequestPolicy, RequestFailure, DEFAULT_DEADLINE, DEFAULT_MAX_ATTEMPTS
+from src.rag_query.image_cache import ImageCache, DEFAULT_MAX_SIDE, DEFAULT_JPEG_QUALITY
+from src.rag_query.response_store import ResponseStore, DEFAULT_STORE_PATH
+from src.rag_query.metrics import PipelineMetrics
 
 # --- (Configuration and Helper functions remain the same) ---
 DATASET_DIR = './design_qa/dataset'
 OUTPUT_DIR = './predictions'
 
+# Upper bound on chat completions in flight at once (shared by all subsets).
+DEFAULT_MAX_IN_FLIGHT = 32
+
+# Dispatch orders: "csv" sends rows as they appear in the CSV, "grouped" sends rows
+# sharing an image and rule context back to back to exploit the server's prefix cache.
+SCHEDULES = ("csv", "grouped")
+THROUGHPUT_FILE = 'throughput.json'
+# Rows that could not be answered (one structured row per failure, see RequestFailure).
+ERRORS_FILE = 'errors.csv'
+
 BENCHMARK_FILES = {
     'retrieval': 'rule_extraction/rule_retrieval_qa.csv',
     'compilation': 'rule_extraction/rule_compilation_qa.csv',
@@ -17,65 +35,335 @@ BENCHMARK_FILES = {
     'functional_performance': 'rule_compliance/rule_functional_performance_qa/context/rule_functional_performance_qa.csv'
 }
 
+# Rule number / compilation term mentioned in a question (one capture group each).
+RULE_PATTERN = r'rule\s+([A-Z0-9.-]+\.[A-Z0-9.-]+)'
+TERM_PATTERN = r'relevant to\s+`([^`]+)`'
+
 def parse_rule_from_question(question_text):
-    match = re.search(r'rule\s+([A-Z0-9.-]+\.[A-Z0-9.-]+)', question_text)
+    match = re.search(RULE_PATTERN, question_text)
     return match.group(1) if match else None
 
 def parse_term_from_question(question_text):
-    match = re.search(r'relevant to\s+`([^`]+)`', question_text)
+    match = re.search(TERM_PATTERN, question_text)
     return match.group(1) if match else None
 
-def run_full_benchmark():
-    if not all(RAG_CONFIG.values()):
-        print("❌ Error: Missing config in ./config/.env file!")
+def parse_subset_questions(df):
+    """Distinct rule ids and terms of a whole subset, extracted column-wise from its questions."""
+    questions = df['question'].astype(str)
+    rule_ids = questions.str.extract(RULE_PATTERN, expand=False).dropna().unique().tolist()
+    terms = questions.str.extract(TERM_PATTERN, expand=False).dropna().unique().tolist()
+    return rule_ids, terms
+
+def image_path_for_row(filename, row):
+    """Location of the row's image inside the dataset folder of its subset."""
+    image_folder_name = filename.replace('.csv', '')
+    return os.path.join(DATASET_DIR, image_folder_name, row['image'])
+
+def dispatch_order(df, schedule):
+    """Row indices in the order they should be sent to the server."""
+    import pandas as pd
+
+    if schedule != "grouped" or 'image' not in df.columns:
+        return list(df.index)
+    rule_ids = df['question'].astype(str).str.extract(RULE_PATTERN, expand=False).fillna('')
+    keys = pd.DataFrame({'image': df['image'].astype(str), 'rule_id': rule_ids}, index=df.index)
+    # Stable sort keeps CSV order inside each (image, rule) group.
+    return list(keys.sort_values(['image', 'rule_id'], kind='stable').index)
+
+class SubsetTimings:
+    """
+    Thread-safe per-subset timing of the image rows: when the first row started running on a
+    worker, when the last server-answered row finished, and how many rows the server answered
+    (response-store hits, missing images and failed rows are counted apart).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subsets = {}
+
+    def _entry(self, subset_name):
+        return self._subsets.setdefault(subset_name, {'first_start': None, 'last_finish': None,
+                                                      'served': 0, 'not_served': 0})
+
+    def started(self, subset_name):
+        now = time.perf_counter()
+        with self._lock:
+            entry = self._entry(subset_name)
+            if entry['first_start'] is None or now < entry['first_start']:
+                entry['first_start'] = now
+
+    def finished(self, subset_name, served):
+        now = time.perf_counter()
+        with self._lock:
+            entry = self._entry(subset_name)
+            if served:
+                entry['served'] += 1
+                entry['last_finish'] = now if entry['last_finish'] is None else max(entry['last_finish'], now)
+            else:
+                entry['not_served'] += 1
+
+    def throughput(self):
+        """{subset: (server-answered rows, seconds from first dispatch to last answer, all served?)}."""
+        with self._lock:
+            return {
+                subset_name: (entry['served'], entry['last_finish'] - entry['first_start'], entry['not_served'] == 0)
+                for subset_name, entry in self._subsets.items() if entry['served']
+            }
+
+def record_throughput(schedule, subset_times, save=True):
+    """
+    Prints rows/sec per image subset for this schedule and the gain over CSV order.
+    With `save=True` the numbers are stored as this schedule's entry in throughput.json;
+    subsets with rows the server did not answer are never stored.
+    """
+    path = os.path.join(OUTPUT_DIR, THROUGHPUT_FILE)
+    history = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            history = json.load(f)
+    current = {
+        subset_name: {'rows': rows, 'seconds': seconds, 'rows_per_s': rows / seconds if seconds else 0.0}
+        for subset_name, (rows, seconds, _) in subset_times.items()
+    }
+    complete = {
+        subset_name: current[subset_name]
+        for subset_name, (_, _, all_served) in subset_times.items() if save and all_served
+    }
+    if complete:
+        history[schedule] = dict(history.get(schedule, {}), **complete)
+        with open(path, 'w') as f:
+            json.dump(history, f, indent=2)
+
+    baseline = history.get("csv", {}) if schedule == "grouped" else {}
+    for subset_name, measured in current.items():
+        line = f"   {subset_name}: {measured['rows_per_s']:.2f} rows/s over {measured['rows']} server-answered rows ({schedule} order)"
+        if subset_name in baseline and baseline[subset_name]['rows_per_s']:
+            line += f", {measured['rows_per_s'] / baseline[subset_name]['rows_per_s']:.2f}x vs csv order"
+        if subset_name not in complete:
+            line += " [not saved: resumed run or rows not answered by the server]"
+        print(line)
+
+def predict_row(client, subset_name, filename, row, preamble=None):
+    """Produces the model prediction for a single benchmark row."""
+    question = row['question']
+    prediction = ""
+
+    if subset_name in ['retrieval', 'compilation']:
+        if subset_name == 'retrieval':
+            rule_id = parse_rule_from_question(question)
+            prediction = client._get_rule_from_kg(rule_id, question, subset_name)
+        elif subset_name == 'compilation':
+            term = parse_term_from_question(question)
+            prediction = client._get_rules_by_term(term, subset_name)
+    else: 
+        image_path = image_path_for_row(filename, row)
+        
+        if not os.path.exists(image_path):
+            raise RequestFailure("missing_image", f"Image not found at {image_path}")
+        else:
+            rule_id = parse_rule_from_question(question)
+            prediction = client.query_compliance(question, image_path, rule_id, subset_name, preamble)
+
+    # Ensure the prediction is always a string before adding it
+    return str(prediction)
+
+def predict_and_checkpoint(client, store, subset_name, filename, row_index, row, preamble=None, errors=None,
+                           timings=None):
+    """Runs predict_row and immediately persists the result so a crash loses at most the in-flight rows."""
+    if timings is not None:
+        timings.started(subset_name)
+    try:
+        with client.metrics.timer("row_total", subset_name):
+            prediction = predict_row(client, subset_name, filename, row, preamble)
+    except RequestFailure as failure:
+        # Failed rows get an empty prediction and an error row; they are not checkpointed so --resume retries them.
+        if errors is not None:
+            errors.append(dict({'subset': subset_name, 'row_index': row_index}, **failure.as_row()))
+        if timings is not None:
+            timings.finished(subset_name, served=False)
+        return ""
+    if timings is not None:
+        timings.finished(subset_name, served=client.last_answer_source() == "server")
+    store.record_prediction(subset_name, row_index, row['question'], prediction)
+    return prediction
+
+def write_errors(errors):
+    """Writes the failed rows to errors.csv (removing a stale file when every row was answered)."""
+    import pandas as pd
+
+    path = os.path.join(OUTPUT_DIR, ERRORS_FILE)
+    if not errors:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    pd.DataFrame(errors).sort_values(['subset', 'row_index']).to_csv(path, index=False)
+    print(f"⚠️  {len(errors)} row(s) could not be answered, see {path} (rerun with --resume to retry them).")
+
+def load_checkpoint(store, subset_name, df):
+    """Returns {row_index: prediction} for rows already answered with the same question."""
+    answered = store.load_predictions(subset_name)
+    return {
+        row_index: prediction
+        for row_index, (question, prediction) in answered.items()
+        if row_index < len(df) and df['question'].iloc[row_index] == question
+    }
+
+def run_full_benchmark(max_in_flight=DEFAULT_MAX_IN_FLIGHT, sequential=False, use_cache=True,
+                       image_max_side=DEFAULT_MAX_SIDE, jpeg_quality=DEFAULT_JPEG_QUALITY,
+                       store_path=DEFAULT_STORE_PATH, resume=False, schedule="csv",
+                       early_stop=False, deadline=DEFAULT_DEADLINE, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                       hedge=False, subtree_context=False):
+    """
+    Runs every benchmark subset and writes one predictions CSV per subset.
+    Rows from all subsets are submitted to a shared thread pool so at most
+    `max_in_flight` requests are outstanding against the VLLM server at once;
+    predictions are written back in the original row order.
+    Every finished row is checkpointed to the response store; with `resume=True`
+    rows answered by a previous run are reused instead of being recomputed.
+    With schedule="grouped", image questions are dispatched grouped by image and rule
+    and use the prefix-first prompt layout; outputs keep the CSV row order either way.
+    Throughput is measured per image subset from its first dispatched row to its last
+    server-answered row; it is only saved to throughput.json for fresh runs in which the
+    server answered every row, so compare schedules with a fresh --store.
+    With `early_stop=True` completions are streamed and cancelled once the subset's
+    answer is determined (see SUBSET_GENERATION in rag_query_client).
+    Every inference call gets a `deadline` and up to `max_attempts` attempts with jittered
+    backoff; with `hedge=True` calls slower than the observed p95 get a duplicate request.
+    Unanswered rows are written to errors.csv instead of the predictions.
+    With `subtree_context=True` image questions get the rule plus all of its sub-rules as context.
+    """
+    import pandas as pd
+    from tqdm import tqdm
+
+    config = get_rag_config()
+    missing = missing_config(config)
+    if missing:
+        print(f"❌ Error: Missing config in ./config/.env file: {', '.join(missing)}")
         return
 
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-    client = RAGQueryClient(RAG_CONFIG)
-    print("🚀 Starting DesignQA Benchmark Evaluation...")
+    image_cache = ImageCache(max_side=image_max_side, quality=jpeg_quality)
+    store = ResponseStore(store_path)
+    metrics = PipelineMetrics()
+    workers = 1 if sequential else max_in_flight
+    # A hedged call can hold two requests (and connections) at once.
+    connections = 2 * workers if hedge else workers
+    policy = RequestPolicy(deadline=deadline, max_attempts=max_attempts, hedge=hedge, hedge_workers=connections)
+    client = RAGQueryClient(config, use_cache=use_cache, use_term_index=use_cache,
+                            image_cache=image_cache, response_store=store, metrics=metrics,
+                            early_stop=early_stop, request_policy=policy, max_connections=connections,
+                            subtree_context=subtree_context)
+    errors = []
+    print(f"🚀 Starting DesignQA Benchmark Evaluation ({workers} request(s) in flight)...")
 
+    # --- 1. Load every subset and preprocess all images ahead of the request loop ---
+    subsets = {}
     for subset_name, filename in BENCHMARK_FILES.items():
         csv_path = os.path.join(DATASET_DIR, filename)
-        print(f"\n--- Processing subset: {subset_name} ---")
         if not os.path.exists(csv_path):
             print(f"⚠️  Warning: File not found: {csv_path}")
             continue
-            
-        df = pd.read_csv(csv_path)
-        predictions = []
-
-        for index, row in tqdm(df.iterrows(), total=df.shape[0], desc=subset_name):
-            question = row['question']
-            prediction = ""
-
-            if subset_name in ['retrieval', 'compilation']:
-                if subset_name == 'retrieval':
-                    rule_id = parse_rule_from_question(question)
-                    prediction = client._get_rule_from_kg(rule_id, question)
-                elif subset_name == 'compilation':
-                    term = parse_term_from_question(question)
-                    prediction = client._get_rules_by_term(term)
-            else: 
-                image_folder_name = filename.replace('.csv', '')
-                image_path = os.path.join(DATASET_DIR, image_folder_name, row['image'])
-                
-                if not os.path.exists(image_path):
-                    prediction = f"Error: Image not found at {image_path}"
-                else:
-                    rule_id = parse_rule_from_question(question)
-                    prediction = client.query_compliance(question, image_path, rule_id)
-            
-            # --- THIS IS THE FIX ---
-            # Ensure the prediction is always a string before adding it
-            predictions.append(str(prediction))
-
-        df['model_prediction'] = predictions
-        output_path = os.path.join(OUTPUT_DIR, f'{subset_name}_predictions.csv')
-        df.to_csv(output_path, index=False)
-        print(f"✅ Predictions saved to {output_path}")
+        subsets[subset_name] = pd.read_csv(csv_path)
+
+    image_paths = [
+        image_path_for_row(BENCHMARK_FILES[subset_name], row)
+        for subset_name, df in subsets.items() if 'image' in df.columns
+        for _, row in df.iterrows()
+    ]
+    image_cache.prefetch(image_paths)
+
+    # --- 2. Submit every row of every subset to the shared pool ---
+    pending = {}
+    timings = SubsetTimings()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for subset_name, df in subsets.items():
+            filename = BENCHMARK_FILES[subset_name]
+            if resume:
+                answered = load_checkpoint(store, subset_name, df)
+                print(f"↩️  {subset_name}: resuming with {len(answered)}/{len(df)} rows already answered.")
+            else:
+                store.clear_predictions(subset_name)
+                answered = {}
+            # Resolve every rule and term of the subset up front so the rows below only wait on inference.
+            rule_ids, terms = parse_subset_questions(df)
+            fetched_rules, fetched_terms = client.prefetch(rule_ids, terms, subset_name)
+            print(f"📥 {subset_name}: prefetched {fetched_rules} rule(s) and {fetched_terms} term(s) "
+                  f"({len(rule_ids)} distinct rules, {len(terms)} distinct terms).")
+            preamble = shared_preamble(df['question']) if schedule == "grouped" and 'image' in df.columns else None
+            results = dict(answered)
+            row_timings = timings if 'image' in df.columns else None
+            for row_index in dispatch_order(df, schedule):
+                if row_index not in results:
+                    results[row_index] = executor.submit(predict_and_checkpoint, client, store, subset_name,
+                                                         filename, row_index, df.loc[row_index], preamble,
+                                                         errors, row_timings)
+            pending[subset_name] = (df, results)
+
+        # --- 3. Collect results in the original row order and save each subset ---
+        for subset_name, (df, results) in pending.items():
+            print(f"\n--- Processing subset: {subset_name} ---")
+            predictions = [
+                results[row_index] if isinstance(results[row_index], str) else results[row_index].result()
+                for row_index in tqdm(df.index, desc=subset_name)
+            ]
 
+            df['model_prediction'] = predictions
+            output_path = os.path.join(OUTPUT_DIR, f'{subset_name}_predictions.csv')
+            df.to_csv(output_path, index=False)
+            print(f"✅ Predictions saved to {output_path}")
+
+    subset_times = timings.throughput()
+    if subset_times:
+        print("\nThroughput of image subsets:")
+        record_throughput(schedule, subset_times, save=not resume)
+    write_errors(errors)
+    metrics.write_report(OUTPUT_DIR)
+    image_cache.report()
+    print(f"Request stats: {client.request_stats()}")
+    if use_cache:
+        print(f"Rule cache stats: {client.cache_stats()}")
     client.close()
+    store.close()
     print("\n🎉 Benchmark evaluation complete! You can now run the official evaluation script.")
 
+def add_arguments(parser):
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Maximum number of concurrent requests across all subsets.")
+    parser.add_argument("--sequential", action="store_true",
+                        help="Process rows one at a time (original behaviour).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Query Neo4j for every rule lookup and term search instead of the in-memory indexes.")
+    parser.add_argument("--image-max-side", type=int, default=DEFAULT_MAX_SIDE,
+                        help="Downscale images so their longest side is at most this many pixels.")
+    parser.add_argument("--jpeg-quality", type=int, default=DEFAULT_JPEG_QUALITY,
+                        help="JPEG quality used when re-encoding images.")
+    parser.add_argument("--store", default=str(DEFAULT_STORE_PATH),
+                        help="SQLite file holding cached responses and per-row checkpoints.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip rows already answered by a previous (interrupted) run.")
+    parser.add_argument("--schedule", choices=SCHEDULES, default="csv",
+                        help="Dispatch rows in CSV order with the original prompts (default), or grouped by "
+                             "image/rule with a prefix-first prompt.")
+    parser.add_argument("--early-stop", action="store_true",
+                        help="Stop generating once the answer is known and use per-subset token budgets "
+                             "(changes the scored predictions; off by default).")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE,
+                        help="Seconds allowed per question, including retries.")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help="Attempts per question on timeouts, dropped connections and 429/5xx responses.")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Send a duplicate request when a call takes longer than the observed p95 latency.")
+    parser.add_argument("--subtree-context", action="store_true",
+                        help="Give image questions the rule together with all of its sub-rules as context.")
+
+def main(args):
+    run_full_benchmark(max_in_flight=args.max_in_flight, sequential=args.sequential, use_cache=not args.no_cache,
+                       image_max_side=args.image_max_side, jpeg_quality=args.jpeg_quality,
+                       store_path=args.store, resume=args.resume, schedule=args.schedule,
+                       early_stop=args.early_stop, deadline=args.deadline,
+                       max_attempts=args.max_attempts, hedge=args.hedge,
+                       subtree_context=args.subtree_context)
+
 if __name__ == "__main__":
-    run_full_benchmark()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate DesignQA predictions for all subsets.")
+    add_arguments(parser)
+    main(parser.parse_args())
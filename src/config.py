@@ -0,0 +1,34 @@
+import os
+from functools import lru_cache
+from pathlib import Path
+
+# The .env file lives in ./config/ relative to the project root (where the scripts are run from).
+ENV_PATH = Path('.') / 'config' / '.env'
+
+
+@lru_cache(maxsize=None)
+def load_env():
+    """Loads ./config/.env into the environment, once, on first use."""
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=ENV_PATH)
+
+
+def get_neo4j_credentials():
+    """Returns (uri, user, password) for the Neo4j server."""
+    load_env()
+    return os.getenv("NEO4J_URI"), os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD")
+
+
+def get_rag_config():
+    """Returns the configuration dictionary used by RAGQueryClient."""
+    load_env()
+    return {
+        "NEO4J_URI": os.getenv("NEO4J_URI"),
+        "NEO4J_USER": os.getenv("NEO4J_USER"),
+        "NEO4J_PASSWORD": os.getenv("NEO4J_PASSWORD"),
+        "VLLM_API_URL": os.getenv("VLLM_API_URL"),
+        "VLLM_MODEL": os.getenv("VLLM_MODEL"),
+        # Knowledge graph backend: "neo4j" (default) or the embedded "sqlite" store.
+        "KG_BACKEND": os.getenv("KG_BACKEND", "neo4j"),
+        "KG_SQLITE_PATH": os.getenv("KG_SQLITE_PATH"),
+    }
@@ -0,0 +1,268 @@
+import os
+import re
+import ast
+import string
+import statistics
+import argparse
+
+# Reproduces the headline metrics of the official DesignQA evaluation (eval/full_evaluation.py)
+# directly on the prediction frames, so prompt/retrieval experiments can be scored in-process.
+# Every metric is computed with vectorized pandas string ops: texts are normalized column-wise,
+# exploded into one row per token (or character), counted with groupby and intersected with a merge.
+
+PREDICTIONS_DIR = './predictions'
+RESULTS_FILE = 'results.txt'
+SUBSETS = ('retrieval', 'compilation', 'definition', 'presence', 'dimension', 'functional_performance')
+
+SEPARATOR = '-*-' * 20
+RULE = '-' * 60
+
+# Same normalization as the official (SQuAD-style) scorer: lowercase, drop punctuation and articles.
+PUNCTUATION_PATTERN = '[' + re.escape(string.punctuation) + ']'
+ARTICLES_PATTERN = r'\b(?:a|an|the)\b'
+
+# `mentions` / `dimension_type` groups reported for the diagnostic averages.
+MENTION_GROUPS = (('definition', 'definition-components'), ('mentioned', 'multimention-components'),
+                  ('not_mentioned', 'no-mention-components'))
+DIMENSION_GROUPS = (('direct', 'directly-dimensioned'), ('scale', 'scale-bar-dimensioned'))
+
+
+def normalize_text(series):
+    """Lowercases, strips punctuation and articles, and collapses whitespace of a text column."""
+    return (series.fillna('').astype(str).str.lower()
+            .str.replace(PUNCTUATION_PATTERN, '', regex=True)
+            .str.replace(ARTICLES_PATTERN, ' ', regex=True)
+            .str.split().str.join(' '))
+
+
+def bag_f1(truth_tokens, predicted_tokens, keys, distinct=False):
+    """
+    F1 between two bags of tokens per key. Both inputs are exploded Series whose index is the key;
+    the overlap of a token is the smaller of its two counts. With `distinct=True` the bags are
+    treated as sets. Keys without overlap score 0.
+    """
+    import pandas as pd
+
+    truth = truth_tokens.dropna().rename('token').rename_axis('key').reset_index()
+    predicted = predicted_tokens.dropna().rename('token').rename_axis('key').reset_index()
+    if distinct:
+        truth, predicted = truth.drop_duplicates(), predicted.drop_duplicates()
+    truth_counts = truth.groupby(['key', 'token']).size().rename('truth')
+    predicted_counts = predicted.groupby(['key', 'token']).size().rename('predicted')
+    common = pd.concat([truth_counts, predicted_counts], axis=1, join='inner').min(axis=1)
+    overlap = common.groupby(level='key').sum().reindex(keys, fill_value=0)
+    truth_length = truth_counts.groupby(level='key').sum().reindex(keys, fill_value=0)
+    predicted_length = predicted_counts.groupby(level='key').sum().reindex(keys, fill_value=0)
+    precision = overlap / predicted_length.where(predicted_length > 0)
+    recall = overlap / truth_length.where(truth_length > 0)
+    f1 = (2 * precision * recall / (precision + recall)).where(overlap > 0, 0.0)
+    return f1.astype(float)
+
+
+def score_retrieval(df):
+    """F1 over the bag of normalized words of the rule text."""
+    truth = normalize_text(df['ground_truth']).str.split().explode()
+    predicted = normalize_text(df['model_prediction']).str.split().explode()
+    return bag_f1(truth, predicted, df.index)
+
+
+def score_compilation(df):
+    """F1 over the set of rule numbers; predictions are read as a comma separated list."""
+    truth = df['ground_truth'].map(ast.literal_eval).explode().dropna().astype(str).str.strip()
+    predicted = df['model_prediction'].fillna('').astype(str).str.split(',').explode().str.strip()
+    return bag_f1(truth[truth != ''], predicted[predicted != ''], df.index, distinct=True)
+
+
+def score_definition(df):
+    """F1 over the bag of characters of the component name, best over the `;`-separated synonyms."""
+    import pandas as pd
+
+    synonyms = df['ground_truth'].fillna('').astype(str).str.split(';').explode()
+    predicted = normalize_text(df['model_prediction']).str.replace(' ', '', regex=False)
+    # One key per synonym; each synonym is paired with the prediction of its row.
+    keys = pd.RangeIndex(len(synonyms))
+    truth_chars = pd.Series(normalize_text(synonyms).str.replace(' ', '', regex=False).to_numpy(), index=keys)
+    predicted_chars = pd.Series(predicted.reindex(synonyms.index).to_numpy(), index=keys)
+    scores = bag_f1(truth_chars.map(list).explode(), predicted_chars.map(list).explode(), keys)
+    return pd.Series(scores.to_numpy(), index=synonyms.index).groupby(level=0).max().reindex(df.index, fill_value=0.0)
+
+
+def score_presence(df):
+    """Accuracy where any 'yes' in the prediction counts as a yes answer."""
+    answer = df['model_prediction'].fillna('').astype(str).str.lower().str.contains('yes', regex=False)
+    truth = df['ground_truth'].astype(str).str.strip().str.lower() == 'yes'
+    return (answer == truth).astype(float)
+
+
+def score_compliance(df):
+    """Accuracy of the yes/no given after 'Answer:'; predictions without an answer line are wrong."""
+    prediction = df['model_prediction'].fillna('').astype(str).str.lower()
+    has_answer = prediction.str.contains('answer:', regex=False)
+    answer = prediction.str.split('answer:').str[-1].str.contains('yes', regex=False)
+    truth = df['ground_truth'].astype(str).str.strip().str.lower() == 'yes'
+    return ((answer == truth) & has_answer).astype(float)
+
+
+SCORERS = {
+    'retrieval': score_retrieval,
+    'compilation': score_compilation,
+    'definition': score_definition,
+    'presence': score_presence,
+    'dimension': score_compliance,
+    'functional_performance': score_compliance,
+}
+
+
+class IncrementalScorer:
+    """
+    Keeps per-row scores for every subset so predictions can be scored as they stream in:
+    `update` only scores rows that are new or whose prediction changed since the last call.
+    """
+    def __init__(self):
+        self.frames = {}
+
+    def update(self, subset_name, df):
+        """Adds/refreshes rows of `df` (ground_truth, model_prediction, optional group columns)."""
+        import pandas as pd
+
+        df = df[df['model_prediction'].notna()]
+        previous = self.frames.get(subset_name)
+        if previous is not None:
+            known = previous['model_prediction'].reindex(df.index)
+            df = df[known.isna() | (known != df['model_prediction'])]
+        if df.empty:
+            return 0
+        scored = df.assign(score=SCORERS[subset_name](df))
+        if previous is not None:
+            scored = pd.concat([previous.drop(index=scored.index, errors='ignore'), scored]).sort_index()
+        self.frames[subset_name] = scored
+        return len(df)
+
+    def scores(self, subset_name):
+        frame = self.frames.get(subset_name)
+        return [] if frame is None else list(frame['score'])
+
+    def average(self, subset_name, column=None, value=None):
+        frame = self.frames.get(subset_name)
+        if frame is None or frame.empty:
+            return 0
+        if column is not None:
+            frame = frame[frame[column] == value] if column in frame.columns else frame.iloc[:0]
+        # statistics.mean sums exactly, which reproduces the official averages to the last digit.
+        return statistics.mean(frame['score'].tolist()) if len(frame) else 0
+
+    def overall(self):
+        return sum(self.average(subset_name) for subset_name in SUBSETS) / len(SUBSETS)
+
+    def report(self):
+        """Renders the scores in the layout of the official results.txt."""
+        lines = [
+            "DESIGNQA EVALUATION RESULTS:", SEPARATOR, SEPARATOR,
+            f"OVERALL SCORE: {_number(self.overall())}", SEPARATOR, SEPARATOR,
+            f"Retrieval Score (Avg F1 BoW): {_number(self.average('retrieval'))}",
+            f"Compilation Score (Avg F1 Rules): {_number(self.average('compilation'))}",
+            f"Definition Score (Avg F1 BoC): {_number(self.average('definition'))}",
+            f"Presence Score (Avg Accuracy): {_number(self.average('presence'))}",
+            f"Dimension Score (Average Accuracy): {_number(self.average('dimension'))}",
+            f"Functional Performance Score (Average Accuracy): {_number(self.average('functional_performance'))}",
+            SEPARATOR, "", "", "",
+            "Below scores by subset are provided for diagnostic purposes:",
+        ]
+        lines += _subset_header('RETRIEVAL') + ["All F1 BoWs:", _numbers(self.scores('retrieval'))]
+        lines += _subset_header('COMPILATION') + ["All F1 Rules:", _numbers(self.scores('compilation'))]
+        lines += _subset_header('DEFINITION')
+        for value, label in MENTION_GROUPS:
+            lines += [f"Avg F1 BoC on {label}:", _number(self.average('definition', 'mentions', value))]
+        lines += ["All F1 BoC:", _numbers(self.scores('definition'))]
+        lines += _subset_header('PRESENCE')
+        for value, label in MENTION_GROUPS:
+            lines += [f"Avg accuracy on {label}:", _number(self.average('presence', 'mentions', value))]
+        lines += ["All accuracies:", _numbers(self.scores('presence'))]
+        lines += _subset_header('DIMENSION')
+        for value, label in DIMENSION_GROUPS:
+            lines += [f"Avg accuracy {label}:", _number(self.average('dimension', 'dimension_type', value))]
+        lines += ["All accuracies:", _numbers(self.scores('dimension'))]
+        lines += _subset_header('FUNCTIONAL PERFORMANCE')
+        lines += ["All accuraciess:", _numbers(self.scores('functional_performance'))]
+        return "\n".join(lines) + "\n"
+
+
+def _subset_header(title):
+    return [RULE, title, RULE]
+
+
+def _number(value):
+    # The official script reports a score of zero as the integer 0.
+    return "0" if value == 0 else repr(float(value))
+
+
+def _numbers(values):
+    return "[" + ", ".join(_number(value) for value in values) + "]"
+
+
+def score_predictions(predictions_dir=PREDICTIONS_DIR, scorer=None):
+    """Scores every `<subset>_predictions.csv` found in `predictions_dir` (incrementally with `scorer`)."""
+    import pandas as pd
+
+    scorer = scorer or IncrementalScorer()
+    for subset_name in SUBSETS:
+        path = os.path.join(predictions_dir, f'{subset_name}_predictions.csv')
+        if not os.path.exists(path):
+            print(f"⚠️  Warning: File not found: {path}")
+            continue
+        updated = scorer.update(subset_name, pd.read_csv(path, encoding='utf-8', keep_default_na=False))
+        print(f"   {subset_name}: scored {updated} new row(s), average {scorer.average(subset_name):.4f}")
+    return scorer
+
+
+def score_checkpoints(store, dataset_files, dataset_dir, scorer=None):
+    """Scores the rows a (possibly still running) benchmark has checkpointed to its response store."""
+    import pandas as pd
+
+    scorer = scorer or IncrementalScorer()
+    for subset_name, filename in dataset_files.items():
+        csv_path = os.path.join(dataset_dir, filename)
+        answered = store.load_predictions(subset_name)
+        if not answered or not os.path.exists(csv_path):
+            continue
+        df = pd.read_csv(csv_path)
+        predictions = pd.Series({row_index: prediction for row_index, (_, prediction) in answered.items()})
+        df = df.loc[df.index.intersection(predictions.index)].assign(model_prediction=predictions)
+        updated = scorer.update(subset_name, df)
+        print(f"   {subset_name}: {len(df)} answered rows ({updated} newly scored), average {scorer.average(subset_name):.4f}")
+    return scorer
+
+
+def write_results(scorer, output_path):
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(scorer.report())
+    print(f"\n✅ Overall score {scorer.overall():.4f}, results saved to {output_path}")
+
+
+def add_arguments(parser):
+    parser.add_argument("--predictions", default=PREDICTIONS_DIR,
+                        help="Folder holding the <subset>_predictions.csv files.")
+    parser.add_argument("--output", default=None,
+                        help="Results file (default: <predictions>/results.txt).")
+    parser.add_argument("--from-store", default=None, metavar="STORE",
+                        help="Score the rows checkpointed in this response store instead of the CSVs (works mid-run).")
+
+
+def main(args):
+    output_path = args.output or os.path.join(args.predictions, RESULTS_FILE)
+    if args.from_store:
+        from run_benchmark import BENCHMARK_FILES, DATASET_DIR
+        from src.rag_query.response_store import ResponseStore
+
+        store = ResponseStore(args.from_store)
+        scorer = score_checkpoints(store, BENCHMARK_FILES, DATASET_DIR)
+        store.close()
+    else:
+        scorer = score_predictions(args.predictions)
+    write_results(scorer, output_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score DesignQA predictions in-process.")
+    add_arguments(parser)
+    main(parser.parse_args())
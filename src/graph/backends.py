@@ -0,0 +1,115 @@
+import re
+import abc
+from collections import namedtuple
+from src.graph.kg_ingestion import rule_sort_key
+
+# One rule as returned by every backend.
+RuleRecord = namedtuple("RuleRecord", ["title", "text", "level", "parent"])
+
+BACKEND_NAMES = ("neo4j", "sqlite")
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercases `text` and splits it into alphanumeric tokens."""
+    if not isinstance(text, str):
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def term_alternatives(term):
+    """
+    Splits a search term into its slash-separated alternatives ('Aerodynamic/Aerodynamics').
+    A rule matches the term when it matches any alternative (see term_matches).
+    """
+    return [alternative.strip() for alternative in term.split('/') if tokenize(alternative)]
+
+
+def term_matches(alternative, title, text):
+    """
+    The term semantics shared by every search path (TermIndex and all backends): the rule's
+    title or text contains `alternative` (case-insensitive, like Cypher CONTAINS) and every
+    word of it starts a word of the rule. So 'aerodynamic' finds 'aerodynamics', but 'ring'
+    does not find 'steering'. The backends' indexes only narrow down the candidates.
+    """
+    needle = alternative.lower()
+    if not any(needle in value.lower() for value in (title, text) if isinstance(value, str)):
+        return False
+    words = set(tokenize(title) + tokenize(text))
+    return all(any(word.startswith(token) for word in words) for token in tokenize(needle))
+
+
+def union_in_rule_order(matches):
+    """Union of several lists of rule_ids, sorted in rule order (V.1.9 before V.1.10)."""
+    return sorted(set().union(*matches), key=rule_sort_key)
+
+
+class KnowledgeGraphBackend(abc.ABC):
+    """
+    Storage interface used by RAGQueryClient and the ingestion scripts.
+    Implementations: Neo4jBackend (src.graph.neo4j_backend) and the embedded
+    SQLiteBackend (src.graph.sqlite_backend).
+    """
+    @abc.abstractmethod
+    def get_rule(self, rule_id):
+        """Returns the RuleRecord for `rule_id`, or None if it does not exist."""
+
+    @abc.abstractmethod
+    def all_rules(self):
+        """Returns every rule as {rule_id: RuleRecord}."""
+
+    @abc.abstractmethod
+    def get_rules(self, rule_ids):
+        """Returns {rule_id: RuleRecord} for the existing rules among `rule_ids`, in one batched query."""
+
+    @abc.abstractmethod
+    def rules_containing(self, substrings):
+        """Returns {substring: [rule_id, ...]} for the rules matching it (see term_matches)."""
+
+    def rules_by_term(self, term):
+        """Returns the ids (in rule order) of the rules matching any slash-separated alternative of `term`."""
+        return self.rules_by_terms([term])[term]
+
+    def rules_by_terms(self, terms):
+        """Returns {term: [rule_id, ...]} for every term, like rules_by_term but with one batched lookup."""
+        alternatives = {term: term_alternatives(term) for term in terms}
+        matches = self.rules_containing(sorted(set().union(*alternatives.values())))
+        return {
+            term: union_in_rule_order(matches.get(alternative, []) for alternative in parts)
+            for term, parts in alternatives.items()
+        }
+
+    @abc.abstractmethod
+    def children_of(self, rule_id):
+        """Returns the ids of the direct sub-rules of `rule_id`."""
+
+    @abc.abstractmethod
+    def subtree(self, rule_id):
+        """
+        Returns [(rule_id, RuleRecord)] for `rule_id` and all of its descendants in rule order
+        (parents first, V.1.9 before V.1.10), fetched with one prefix query on the materialized path.
+        """
+
+    @abc.abstractmethod
+    def upsert_rules(self, records):
+        """Inserts or updates rule records (see src.graph.kg_ingestion.records_from_sheets)."""
+
+    @abc.abstractmethod
+    def delete_rules(self, rule_ids):
+        """Deletes the given rules (and their relationships/search entries)."""
+
+    def close(self):
+        pass
+
+
+def create_backend(config):
+    """Builds the backend selected by config["KG_BACKEND"] (default: neo4j)."""
+    name = (config.get("KG_BACKEND") or "neo4j").lower()
+    if name == "neo4j":
+        from src.graph.neo4j_backend import Neo4jBackend
+        return Neo4jBackend.connect(config["NEO4J_URI"], config["NEO4J_USER"], config["NEO4J_PASSWORD"])
+    if name == "sqlite":
+        from src.graph.sqlite_backend import SQLiteBackend
+        return SQLiteBackend(config.get("KG_SQLITE_PATH") or ":memory:")
+    raise ValueError(f"Unknown KG_BACKEND '{name}', expected one of {BACKEND_NAMES}")
@@ -1,23 +1,302 @@
 import os
-import pandas as pd
-from neo4j import GraphDatabase
-from dotenv import load_dotenv
-from pathlib import Path
-
-# --- Load Environment Variables ---
-# This setup assumes the script is initiated from the project root (e.g., by main.py)
-# It correctly finds the .env file in the ./config/ directory.
-env_path = Path('.') / 'config' / '.env'
-load_dotenv(dotenv_path=env_path)
-
-# Export credentials so they can be imported and checked by main.py
-NEO4J_URI = os.getenv("NEO4J_URI")
-NEO4J_USERNAME = os.getenv("NEO4J_USER")
-NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD")
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from src.config import get_neo4j_credentials
+from src.graph.schema import ensure_schema, verify_index_usage
+
+# pandas and the neo4j driver are imported where they are used so that importing this
+# module (e.g. for the CLI) stays cheap; ./config/.env is only read when credentials are needed.
+_CREDENTIAL_NAMES = ("NEO4J_URI", "NEO4J_USERNAME", "NEO4J_PASSWORD")
+
+def __getattr__(name):
+    """Resolves NEO4J_URI / NEO4J_USERNAME / NEO4J_PASSWORD lazily from ./config/.env."""
+    if name in _CREDENTIAL_NAMES:
+        return get_neo4j_credentials()[_CREDENTIAL_NAMES.index(name)]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Number of rows sent per UNWIND transaction in batched mode.
+DEFAULT_BATCH_SIZE = 500
+
+# --- Batched Cypher Queries ---
+# Node MERGE and relationship MERGE run in the same transaction for every chunk.
+# path/sort_key are derived from rule_id, so they are (re)set on existing nodes too.
+LEVEL1_BATCH_QUERY = """
+UNWIND $rows AS row
+MERGE (r:Rule {rule_id: row.rule_id}) ON CREATE SET r.title = row.title, r.level = 1
+SET r.path = row.path, r.sort_key = row.sort_key
+WITH r
+MATCH (rb:Rulebook {name: $book_name})
+MERGE (rb)-[:CONTAINS_CATEGORY]->(r)
+"""
+
+LEVEL2_BATCH_QUERY = """
+UNWIND $rows AS row
+MERGE (c:Rule {rule_id: row.rule_id}) ON CREATE SET c.title = row.title, c.text = row.text, c.level = 2
+SET c.path = row.path, c.sort_key = row.sort_key
+WITH c, row
+MATCH (p:Rule {rule_id: row.parent_id})
+MERGE (p)-[:HAS_SUB_RULE]->(c)
+"""
+
+LEVEL3_BATCH_QUERY = """
+UNWIND $rows AS row
+MERGE (c:Rule {rule_id: row.rule_id}) ON CREATE SET c.text = row.text, c.level = 3
+SET c.path = row.path, c.sort_key = row.sort_key
+WITH c, row
+MATCH (p:Rule {rule_id: row.parent_id})
+MERGE (p)-[:HAS_SUB_RULE]->(c)
+"""
+
+BATCH_QUERIES = {1: LEVEL1_BATCH_QUERY, 2: LEVEL2_BATCH_QUERY, 3: LEVEL3_BATCH_QUERY}
+
+# --- Incremental Sync Queries ---
+# Unlike the ON CREATE SET queries above, these overwrite properties so edited rules are updated.
+SYNC_RULEBOOKS_QUERY = "UNWIND $rows AS name MERGE (:Rulebook {name: name})"
+
+# Every stored rule (not only those of the incoming categories), so a category or rulebook that
+# disappeared entirely is removed too. Categories also return the rulebook(s) linking to them.
+SYNC_EXISTING_QUERY = """
+MATCH (r:Rule)
+OPTIONAL MATCH (rb:Rulebook)-[:CONTAINS_CATEGORY]->(r)
+RETURN r.rule_id AS rule_id, r.content_hash AS content_hash, collect(rb.name) AS rulebooks
+"""
+
+SYNC_RULEBOOK_NAMES_QUERY = "MATCH (rb:Rulebook) RETURN rb.name AS name"
+
+SYNC_UPSERT_QUERY = """
+UNWIND $rows AS row
+MERGE (r:Rule {rule_id: row.rule_id})
+SET r.title = row.title, r.text = row.text, r.level = row.level, r.content_hash = row.content_hash,
+    r.path = row.path, r.sort_key = row.sort_key
+"""
+
+# Replaces the category's link, so a category that moved to another rulebook loses the old one.
+SYNC_CATEGORY_LINK_QUERY = """
+UNWIND $rows AS row
+MATCH (rb:Rulebook {name: row.rulebook})
+MATCH (r:Rule {rule_id: row.rule_id})
+OPTIONAL MATCH (other:Rulebook)-[old:CONTAINS_CATEGORY]->(r) WHERE other <> rb
+DELETE old
+WITH DISTINCT rb, r
+MERGE (rb)-[:CONTAINS_CATEGORY]->(r)
+"""
+
+SYNC_PARENT_LINK_QUERY = """
+UNWIND $rows AS row
+MATCH (p:Rule {rule_id: row.parent_id})
+MATCH (c:Rule {rule_id: row.rule_id})
+MERGE (p)-[:HAS_SUB_RULE]->(c)
+"""
+
+SYNC_DELETE_QUERY = "UNWIND $rows AS rule_id MATCH (r:Rule {rule_id: rule_id}) DETACH DELETE r"
+
+SYNC_DELETE_RULEBOOKS_QUERY = "UNWIND $rows AS name MATCH (rb:Rulebook {name: name}) DETACH DELETE rb"
+
+# --- Parallel Ingestion Settings ---
+# Concurrent write transactions in flight against the server in parallel mode.
+DEFAULT_WRITE_WORKERS = 4
+# Attempts per batch when the server reports a transient error (e.g. a deadlock).
+DEFAULT_WRITE_ATTEMPTS = 5
+
+
+# Numeric segments of the sort key are zero-padded to this width.
+SORT_KEY_WIDTH = 4
+
+
+def parent_rule_id(rule_id):
+    """Derives the parent rule number (e.g. 'V.1.2' -> 'V.1')."""
+    return ".".join(str(rule_id).split('.')[:-1])
+
+
+def rule_path(rule_id):
+    """
+    Materialized path of a rule ('V.1' -> 'V.1.'). Every rule of the subtree of V.1 has a
+    path starting with 'V.1.', while V.10 does not, so a subtree is one prefix/range query.
+    """
+    return f"{rule_id}."
+
+
+def rule_sort_key(rule_id):
+    """Zero-pads the numbers of a rule id ('V.1.10' -> 'V.0001.0010') so V.1.10 sorts after V.1.9."""
+    return re.sub(r'\d+', lambda match: match.group().zfill(SORT_KEY_WIDTH), str(rule_id))
+
+
+def read_rulebook_sheets(file_path):
+    """
+    Reads the Level1/2/3 sheets of a structured Excel rulebook into row dictionaries.
+    Returns the rulebook name and a {level: [rows]} mapping ready to be sent as UNWIND parameters.
+    """
+    import pandas as pd
+
+    filename = os.path.basename(file_path)
+    # Example: "AD - ADMINISTRATIVE REGULATION.xlsx" -> "ADMINISTRATIVE REGULATION"
+    rulebook_name = filename.split(' - ')[1].replace('.xlsx', '')
+    xls = pd.ExcelFile(file_path)
+    sheets = {}
+
+    if 'Level1' in xls.sheet_names:
+        df1 = pd.read_excel(xls, 'Level1').dropna(how='all')
+        sheets[1] = [
+            {'rule_id': str(rule_id), 'path': rule_path(rule_id), 'sort_key': rule_sort_key(rule_id), 'title': title}
+            for rule_id, title in zip(df1['Level1_rule_number'], df1['Level1_rule_title'])
+        ]
+
+    if 'Level2' in xls.sheet_names:
+        df2 = pd.read_excel(xls, 'Level2').dropna(how='all').fillna('')
+        sheets[2] = [
+            {'rule_id': str(rule_id), 'parent_id': parent_rule_id(rule_id), 'path': rule_path(rule_id),
+             'sort_key': rule_sort_key(rule_id), 'title': title, 'text': text}
+            for rule_id, title, text in zip(df2['Level2_rule_number'], df2['Level2_rule_title'], df2['Level2_rule_text'])
+        ]
+
+    if 'Level3' in xls.sheet_names:
+        df3 = pd.read_excel(xls, 'Level3').dropna(how='all').fillna('')
+        sheets[3] = [
+            {'rule_id': str(rule_id), 'parent_id': parent_rule_id(rule_id), 'path': rule_path(rule_id),
+             'sort_key': rule_sort_key(rule_id), 'text': text}
+            for rule_id, text in zip(df3['Level3_rule_number'], df3['Level3_rule_text'])
+        ]
+
+    return rulebook_name, sheets
+
+
+def _clean_value(value):
+    """Normalizes pandas NaN to None so hashing and Neo4j see the same empty value."""
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def rule_content_hash(record):
+    """SHA-256 over every property a rule stores in the graph."""
+    fields = [record['rule_id'], record['level'], record.get('parent_id'), record.get('title'), record.get('text'),
+              record.get('path'), record.get('sort_key')]
+    return hashlib.sha256(json.dumps(fields, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def records_from_sheets(rulebook_name, sheets):
+    """Flattens the {level: [rows]} sheets into one record per rule, each carrying its content hash."""
+    records = []
+    for level in (1, 2, 3):
+        for row in sheets.get(level, []):
+            record = {
+                'rule_id': row['rule_id'],
+                'level': level,
+                'parent_id': row.get('parent_id'),
+                'path': rule_path(row['rule_id']),
+                'sort_key': rule_sort_key(row['rule_id']),
+                'title': _clean_value(row.get('title')),
+                'text': _clean_value(row.get('text')),
+                'rulebook': rulebook_name,
+            }
+            record['content_hash'] = rule_content_hash(record)
+            records.append(record)
+    return records
+
+
+def read_rulebook_records(file_path):
+    """Reads a structured Excel rulebook as a flat list of hashed rule records."""
+    rulebook_name, sheets = read_rulebook_sheets(file_path)
+    return records_from_sheets(rulebook_name, sheets)
+
+
+def read_rule_store_records(path):
+    """Reads the columnar rule store as a flat list of hashed rule records."""
+    from src.parsing.rule_store import read_rule_store
+
+    columns = ['rule_num', 'level', 'parent', 'title', 'text', 'rulebook']
+    table = read_rule_store(path, columns=columns)
+    records = []
+    for rule_id, level, parent, title, text, rulebook in zip(*(table.column(name).to_pylist() for name in columns)):
+        record = {
+            'rule_id': rule_id,
+            'level': int(level),
+            'parent_id': parent if level > 1 else None,
+            'path': rule_path(rule_id),
+            'sort_key': rule_sort_key(rule_id),
+            'title': _clean_value(title),
+            'text': _clean_value(text),
+            'rulebook': rulebook,
+        }
+        record['content_hash'] = rule_content_hash(record)
+        records.append(record)
+    return records
+
+
+def sheets_from_records(records):
+    """Groups flat rule records back into {rulebook: {level: [rows]}} for the batched upload."""
+    books = {}
+    for record in records:
+        books.setdefault(record['rulebook'], {}).setdefault(record['level'], []).append(record)
+    return books
+
+
+def write_in_batches(driver, query, rows, batch_size=DEFAULT_BATCH_SIZE, **params):
+    """Sends `rows` as chunked UNWIND parameter lists, one write transaction per chunk."""
+    def _write_chunk(tx, chunk):
+        tx.run(query, rows=chunk, **params).consume()
+
+    with driver.session() as session:
+        for start in range(0, len(rows), batch_size):
+            session.execute_write(_write_chunk, rows[start:start + batch_size])
+
+
+def write_batch_with_retry(driver, query, rows, max_attempts=DEFAULT_WRITE_ATTEMPTS, **params):
+    """
+    Sends one UNWIND batch in an explicit write transaction, retrying transient failures
+    (deadlocks, lock timeouts) with jittered exponential backoff. Returns the attempts used.
+    """
+    from neo4j.exceptions import TransientError
+
+    for attempt in range(1, max_attempts + 1):
+        try:
+            with driver.session() as session:
+                with session.begin_transaction() as tx:
+                    tx.run(query, rows=rows, **params).consume()
+                    tx.commit()
+            return attempt
+        except TransientError as e:
+            if attempt == max_attempts:
+                raise
+            delay = min(2.0, 0.05 * 2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f" Transient error on a batch of {len(rows)} rows ({e.code}), retry {attempt} in {delay:.2f}s...")
+            time.sleep(delay)
+
+
+def parse_rulebooks_parallel(file_paths, workers=None):
+    """
+    Parses the Excel rulebooks in a process pool.
+    Returns {file_path: (records, parse_seconds)} in completion order.
+    """
+    parsed = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_timed_read_rulebook_records, file_path): file_path for file_path in file_paths}
+        for future in as_completed(futures):
+            file_path = futures[future]
+            try:
+                parsed[file_path] = future.result()
+            except Exception as e:
+                print(f" Error processing file {file_path}: {e}")
+    return parsed
+
+
+def _timed_read_rulebook_records(file_path):
+    start_time = time.perf_counter()
+    records = read_rulebook_records(file_path)
+    return records, time.perf_counter() - start_time
+
 
 class Neo4jUploader:
-    """Handles connection and data uploading to Neo4j from Excel files."""
-    def __init__(self, uri, user, password):
+    """Handles connection and data uploading to Neo4j from the rule store or Excel files."""
+    def __init__(self, uri, user, password, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        from neo4j import GraphDatabase
+
         try:
             self.driver = GraphDatabase.driver(uri, auth=(user, password))
             self.driver.verify_connectivity()
@@ -30,69 +309,199 @@ class Neo4jUploader:
         if self.driver:
             self.driver.close()
 
+    def ensure_schema(self, verify=True):
+        """Creates constraints/indexes before ingestion and optionally checks the query plans use them."""
+        ensure_schema(self.driver)
+        if verify:
+            verify_index_usage(self.driver)
+
     def run_query(self, query, **params):
         """Runs a Cypher query against the database."""
         with self.driver.session() as session:
             session.run(query, **params)
 
-    def upload_rulebook_from_excel(self, file_path):
+    def upload_rulebook_from_excel(self, file_path, batched=True):
         """
         Processes a single Excel file and uploads its sheets (Level1, 2, 3) to Neo4j.
+        With `batched=True` each sheet is sent as chunked UNWIND transactions of
+        `self.batch_size` rows; otherwise every row is sent as its own pair of queries.
         """
         try:
-            # --- 1. Parse Rulebook Name from Filename ---
-            filename = os.path.basename(file_path)
-            # Example: "AD - ADMINISTRATIVE REGULATION.xlsx" -> "ADMINISTRATIVE REGULATION"
-            rulebook_name = filename.split(' - ')[1].replace('.xlsx', '')
-            print(f"\nProcessing rulebook: '{rulebook_name}'...")
-
-            # --- 2. Create the Root Rulebook Node ---
-            self.run_query("MERGE (rb:Rulebook {name: $name})", name=rulebook_name)
-            
-            xls = pd.ExcelFile(file_path)
-
-            # --- 3. Process Level 1 Sheet ---
-            if 'Level1' in xls.sheet_names:
-                df1 = pd.read_excel(xls, 'Level1').dropna(how='all')
-                for _, row in df1.iterrows():
-                    self.run_query(
-                        "MERGE (r:Rule {rule_id: $rule_id}) ON CREATE SET r.title = $title, r.level = 1",
-                        rule_id=row['Level1_rule_number'], title=row['Level1_rule_title']
-                    )
-                    self.run_query(
-                        "MATCH (rb:Rulebook {name: $book_name}) MATCH (r:Rule {rule_id: $rule_id}) MERGE (rb)-[:CONTAINS_CATEGORY]->(r)",
-                        book_name=rulebook_name, rule_id=row['Level1_rule_number']
-                    )
-            
-            # --- 4. Process Level 2 Sheet ---
-            if 'Level2' in xls.sheet_names:
-                df2 = pd.read_excel(xls, 'Level2').dropna(how='all').fillna('')
-                for _, row in df2.iterrows():
-                    parent_id = ".".join(str(row['Level2_rule_number']).split('.')[:-1])
-                    self.run_query(
-                        "MERGE (r:Rule {rule_id: $rule_id}) ON CREATE SET r.title = $title, r.text = $text, r.level = 2",
-                        rule_id=row['Level2_rule_number'], title=row['Level2_rule_title'], text=row['Level2_rule_text']
-                    )
-                    self.run_query(
-                        "MATCH (p:Rule {rule_id: $parent_id}), (c:Rule {rule_id: $child_id}) MERGE (p)-[:HAS_SUB_RULE]->(c)",
-                        parent_id=parent_id, child_id=row['Level2_rule_number']
-                    )
-
-            # --- 5. Process Level 3 Sheet ---
-            if 'Level3' in xls.sheet_names:
-                df3 = pd.read_excel(xls, 'Level3').dropna(how='all').fillna('')
-                for _, row in df3.iterrows():
-                    parent_id = ".".join(str(row['Level3_rule_number']).split('.')[:-1])
-                    self.run_query(
-                        "MERGE (r:Rule {rule_id: $rule_id}) ON CREATE SET r.text = $text, r.level = 3",
-                        rule_id=row['Level3_rule_number'], text=row['Level3_rule_text']
-                    )
-                    self.run_query(
-                        "MATCH (p:Rule {rule_id: $parent_id}), (c:Rule {rule_id: $child_id}) MERGE (p)-[:HAS_SUB_RULE]->(c)",
-                        parent_id=parent_id, child_id=row['Level3_rule_number']
-                    )
-            
-            print(f" Finished uploading '{rulebook_name}'.")
+            rulebook_name, sheets = read_rulebook_sheets(file_path)
+            self.upload_rulebook(rulebook_name, sheets, batched=batched)
+        except Exception as e:
+            print(f" Error processing file {file_path}: {e}")
 
+    def upload_rule_store(self, path, batched=True):
+        """Uploads every rulebook contained in the columnar rule store (see src.parsing.rule_store)."""
+        try:
+            for rulebook_name, sheets in sheets_from_records(read_rule_store_records(path)).items():
+                self.upload_rulebook(rulebook_name, sheets, batched=batched)
         except Exception as e:
-            print(f" Error processing file {file_path}: {e}")
\ No newline at end of file
+            print(f" Error processing rule store {path}: {e}")
+
+    def upload_rulebook(self, rulebook_name, sheets, batched=True):
+        """Uploads one rulebook given as {level: [rows]} (parents before children)."""
+        # --- 1. Create the Root Rulebook Node ---
+        start_time = time.perf_counter()
+        print(f"\nProcessing rulebook: '{rulebook_name}'...")
+        self.run_query("MERGE (rb:Rulebook {name: $name})", name=rulebook_name)
+
+        # --- 2. Process Level 1, 2 and 3 Rows ---
+        for level in (1, 2, 3):
+            rows = sheets.get(level, [])
+            if not rows:
+                continue
+            if batched:
+                write_in_batches(self.driver, BATCH_QUERIES[level], rows, self.batch_size, book_name=rulebook_name)
+            else:
+                self._upload_rows_individually(level, rows, rulebook_name)
+
+        total_rows = sum(len(rows) for rows in sheets.values())
+        elapsed = time.perf_counter() - start_time
+        mode = f"batched, batch_size={self.batch_size}" if batched else "row-by-row"
+        print(f" Finished uploading '{rulebook_name}': {total_rows} rows in {elapsed:.2f}s "
+              f"({total_rows / elapsed if elapsed else 0:.1f} rows/sec, {mode}).")
+
+    def sync_rules(self, records):
+        """
+        Incrementally syncs the graph with `records` (see records_from_sheets), which must hold
+        every rulebook. Only rules whose content hash (or, for categories, rulebook) differs from
+        the stored one are upserted; stored rules and rulebooks missing from `records` are deleted.
+        Returns the {'added', 'changed', 'removed', 'removed_rulebooks'} lists.
+        """
+        start_time = time.perf_counter()
+        with self.driver.session() as session:
+            existing = {
+                record['rule_id']: (record['content_hash'], sorted(record['rulebooks']))
+                for record in session.run(SYNC_EXISTING_QUERY)
+            }
+            stored_rulebooks = {record['name'] for record in session.run(SYNC_RULEBOOK_NAMES_QUERY)}
+
+        def is_changed(r):
+            content_hash, rulebooks = existing[r['rule_id']]
+            return content_hash != r['content_hash'] or (r['level'] == 1 and rulebooks != [r['rulebook']])
+
+        source_ids = {record['rule_id'] for record in records}
+        added = [r for r in records if r['rule_id'] not in existing]
+        changed = [r for r in records if r['rule_id'] in existing and is_changed(r)]
+        removed = sorted(set(existing) - source_ids)
+        removed_rulebooks = sorted(stored_rulebooks - {r['rulebook'] for r in records})
+        upserts = sorted(added + changed, key=lambda r: r['level'])
+
+        # --- 1. Nodes first, so every link below can find both of its endpoints ---
+        write_in_batches(self.driver, SYNC_RULEBOOKS_QUERY, sorted({r['rulebook'] for r in upserts}), self.batch_size)
+        write_in_batches(self.driver, SYNC_UPSERT_QUERY, upserts, self.batch_size)
+
+        # --- 2. Relationships of the upserted rules ---
+        write_in_batches(self.driver, SYNC_CATEGORY_LINK_QUERY, [r for r in upserts if r['level'] == 1], self.batch_size)
+        write_in_batches(self.driver, SYNC_PARENT_LINK_QUERY, [r for r in upserts if r['level'] > 1], self.batch_size)
+
+        # --- 3. Rules and whole rulebooks that disappeared from the source ---
+        write_in_batches(self.driver, SYNC_DELETE_QUERY, removed, self.batch_size)
+        write_in_batches(self.driver, SYNC_DELETE_RULEBOOKS_QUERY, removed_rulebooks, self.batch_size)
+
+        diff = {
+            'added': [r['rule_id'] for r in added],
+            'changed': [r['rule_id'] for r in changed],
+            'removed': removed,
+            'removed_rulebooks': removed_rulebooks,
+        }
+        elapsed = time.perf_counter() - start_time
+        print(f"\n Sync complete in {elapsed:.2f}s: {len(diff['added'])} added, {len(diff['changed'])} changed, "
+              f"{len(diff['removed'])} removed, {len(records) - len(upserts)} unchanged, "
+              f"{len(removed_rulebooks)} rulebooks removed.")
+        for kind, rule_ids in diff.items():
+            if rule_ids:
+                preview = ", ".join(rule_ids[:10]) + (" ..." if len(rule_ids) > 10 else "")
+                print(f"   {kind}: {preview}")
+        return diff
+
+    def upload_parallel(self, sources, write_workers=DEFAULT_WRITE_WORKERS, max_attempts=DEFAULT_WRITE_ATTEMPTS):
+        """
+        Uploads several rulebooks at once through a pool of `write_workers` concurrent write
+        transactions. `sources` maps a label (file name) to (records, parse_seconds).
+        The per-file write time is summed over that file's transactions.
+        Every node of every file is written before the first relationship, so a child whose
+        parent lives in another file (or in a batch that finished later) is always linked.
+        Prints the time spent per file and overall.
+        """
+        start_time = time.perf_counter()
+        records = [record for file_records, _ in sources.values() for record in file_records]
+        label_of = {}
+        for label, (file_records, _) in sources.items():
+            for record in file_records:
+                label_of[record['rule_id']] = label
+        write_seconds = {label: 0.0 for label in sources}
+        retries = [0]
+        lock = threading.Lock()
+
+        def _write(label, query, rows):
+            batch_start = time.perf_counter()
+            attempts = write_batch_with_retry(self.driver, query, rows, max_attempts)
+            with lock:
+                write_seconds[label] += time.perf_counter() - batch_start
+                retries[0] += attempts - 1
+
+        def _run_phase(query, rows, key):
+            # Rows are grouped per file and sorted by `key` so batches touching the same
+            # parent node end up together instead of contending for its lock.
+            tasks = []
+            for label in sources:
+                file_rows = sorted((r for r in rows if label_of[r['rule_id']] == label), key=key)
+                for batch_start in range(0, len(file_rows), self.batch_size):
+                    tasks.append((label, query, file_rows[batch_start:batch_start + self.batch_size]))
+            with ThreadPoolExecutor(max_workers=write_workers) as executor:
+                for future in as_completed([executor.submit(_write, *task) for task in tasks]):
+                    future.result()
+
+        # --- 1. Nodes (rulebooks and rules of every file) ---
+        write_in_batches(self.driver, SYNC_RULEBOOKS_QUERY, sorted({r['rulebook'] for r in records}), self.batch_size)
+        _run_phase(SYNC_UPSERT_QUERY, records, key=lambda r: r['rule_id'])
+        nodes_done = time.perf_counter()
+
+        # --- 2. Relationships, only once all nodes exist ---
+        _run_phase(SYNC_CATEGORY_LINK_QUERY, [r for r in records if r['level'] == 1], key=lambda r: r['rule_id'])
+        _run_phase(SYNC_PARENT_LINK_QUERY, [r for r in records if r['level'] > 1], key=lambda r: r['parent_id'])
+
+        # --- 3. Timing report ---
+        elapsed = time.perf_counter() - start_time
+        print(f"\n Parallel upload of {len(sources)} rulebooks ({write_workers} concurrent transactions, "
+              f"batch_size={self.batch_size}):")
+        for label, (file_records, parse_seconds) in sorted(sources.items()):
+            print(f"   {os.path.basename(label)}: {len(file_records)} rows, parse {parse_seconds:.2f}s, "
+                  f"write {write_seconds[label]:.2f}s")
+        print(f" Finished {len(records)} rows in {elapsed:.2f}s (nodes {nodes_done - start_time:.2f}s, "
+              f"links {elapsed - (nodes_done - start_time):.2f}s, {retries[0]} transient retries, "
+              f"{len(records) / elapsed if elapsed else 0:.1f} rows/sec).")
+
+    def _upload_rows_individually(self, level, rows, rulebook_name):
+        """Original ingestion path: two auto-commit queries per row."""
+        for row in rows:
+            if level == 1:
+                self.run_query(
+                    "MERGE (r:Rule {rule_id: $rule_id}) ON CREATE SET r.title = $title, r.level = 1 "
+                    "SET r.path = $path, r.sort_key = $sort_key",
+                    rule_id=row['rule_id'], title=row['title'], path=row['path'], sort_key=row['sort_key']
+                )
+                self.run_query(
+                    "MATCH (rb:Rulebook {name: $book_name}) MATCH (r:Rule {rule_id: $rule_id}) MERGE (rb)-[:CONTAINS_CATEGORY]->(r)",
+                    book_name=rulebook_name, rule_id=row['rule_id']
+                )
+                continue
+            if level == 2:
+                self.run_query(
+                    "MERGE (r:Rule {rule_id: $rule_id}) ON CREATE SET r.title = $title, r.text = $text, r.level = 2 "
+                    "SET r.path = $path, r.sort_key = $sort_key",
+                    rule_id=row['rule_id'], title=row['title'], text=row['text'], path=row['path'], sort_key=row['sort_key']
+                )
+            else:
+                self.run_query(
+                    "MERGE (r:Rule {rule_id: $rule_id}) ON CREATE SET r.text = $text, r.level = 3 "
+                    "SET r.path = $path, r.sort_key = $sort_key",
+                    rule_id=row['rule_id'], text=row['text'], path=row['path'], sort_key=row['sort_key']
+                )
+            self.run_query(
+                "MATCH (p:Rule {rule_id: $parent_id}), (c:Rule {rule_id: $child_id}) MERGE (p)-[:HAS_SUB_RULE]->(c)",
+                parent_id=row['parent_id'], child_id=row['rule_id']
+            )
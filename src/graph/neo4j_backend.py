@@ -0,0 +1,118 @@
+from neo4j import GraphDatabase
+from src.graph.backends import KnowledgeGraphBackend, RuleRecord, tokenize, term_matches
+from src.graph.schema import RULE_SEARCH_INDEX
+from src.graph.kg_ingestion import (
+    write_in_batches, parent_rule_id, rule_path, DEFAULT_BATCH_SIZE, SYNC_RULEBOOKS_QUERY, SYNC_UPSERT_QUERY,
+    SYNC_CATEGORY_LINK_QUERY, SYNC_PARENT_LINK_QUERY, SYNC_DELETE_QUERY
+)
+
+ALL_RULES_QUERY = """
+MATCH (r:Rule)
+OPTIONAL MATCH (p:Rule)-[:HAS_SUB_RULE]->(r)
+RETURN r.rule_id AS rule_id, r.title AS title, r.text AS text, r.level AS level, p.rule_id AS parent
+"""
+
+SINGLE_RULE_QUERY = """
+MATCH (r:Rule {rule_id: $rule_id})
+OPTIONAL MATCH (p:Rule)-[:HAS_SUB_RULE]->(r)
+RETURN r.title AS title, r.text AS text, r.level AS level, p.rule_id AS parent
+"""
+
+# Batched variants used to prefetch a whole benchmark subset in one round trip.
+RULES_BY_ID_QUERY = """
+UNWIND $ids AS rule_id
+MATCH (r:Rule {rule_id: rule_id})
+OPTIONAL MATCH (p:Rule)-[:HAS_SUB_RULE]->(r)
+RETURN r.rule_id AS rule_id, r.title AS title, r.text AS text, r.level AS level, p.rule_id AS parent
+"""
+
+# Candidates come from the fulltext index (every word required, each as a prefix); the few
+# candidates are then checked with term_matches, like every other search path.
+TERMS_QUERY = f"""
+UNWIND $terms AS term
+CALL db.index.fulltext.queryNodes('{RULE_SEARCH_INDEX}', term.query) YIELD node AS r
+RETURN term.term AS term, r.rule_id AS rule_id, r.title AS title, r.text AS text
+"""
+
+CHILDREN_QUERY = """
+MATCH (:Rule {rule_id: $rule_id})-[:HAS_SUB_RULE]->(c:Rule)
+RETURN c.rule_id AS rule_id ORDER BY c.sort_key
+"""
+
+# Served by the range index on r.path (NodeIndexSeekByRange); no relationship traversal needed.
+SUBTREE_QUERY = """
+MATCH (r:Rule) WHERE r.path STARTS WITH $path
+RETURN r.rule_id AS rule_id, r.title AS title, r.text AS text, r.level AS level
+ORDER BY r.sort_key
+"""
+
+
+class Neo4jBackend(KnowledgeGraphBackend):
+    """Knowledge graph stored in a Neo4j server, queried over Bolt."""
+    def __init__(self, driver, batch_size=DEFAULT_BATCH_SIZE):
+        self.driver = driver
+        self.batch_size = batch_size
+
+    @classmethod
+    def connect(cls, uri, user, password, **kwargs):
+        return cls(GraphDatabase.driver(uri, auth=(user, password)), **kwargs)
+
+    def get_rule(self, rule_id):
+        with self.driver.session() as session:
+            record = session.run(SINGLE_RULE_QUERY, rule_id=rule_id).single()
+        if not record:
+            return None
+        return RuleRecord(record["title"], record["text"], record["level"], record["parent"])
+
+    def all_rules(self):
+        with self.driver.session() as session:
+            return {
+                record["rule_id"]: RuleRecord(record["title"], record["text"], record["level"], record["parent"])
+                for record in session.run(ALL_RULES_QUERY)
+            }
+
+    def get_rules(self, rule_ids):
+        with self.driver.session() as session:
+            return {
+                record["rule_id"]: RuleRecord(record["title"], record["text"], record["level"], record["parent"])
+                for record in session.run(RULES_BY_ID_QUERY, ids=list(rule_ids))
+            }
+
+    def rules_containing(self, substrings):
+        matches = {substring: [] for substring in substrings}
+        terms = []
+        for substring in matches:
+            tokens = tokenize(substring)
+            if tokens:
+                terms.append({"term": substring, "query": " ".join(f"+{token}*" for token in tokens)})
+        with self.driver.session() as session:
+            for record in session.run(TERMS_QUERY, terms=terms):
+                if term_matches(record["term"], record["title"], record["text"]):
+                    matches[record["term"]].append(record["rule_id"])
+        return matches
+
+    def children_of(self, rule_id):
+        with self.driver.session() as session:
+            return [record["rule_id"] for record in session.run(CHILDREN_QUERY, rule_id=rule_id)]
+
+    def subtree(self, rule_id):
+        with self.driver.session() as session:
+            records = list(session.run(SUBTREE_QUERY, path=rule_path(rule_id)))
+        return [
+            (record["rule_id"], RuleRecord(record["title"], record["text"], record["level"],
+                                           parent_rule_id(record["rule_id"]) or None))
+            for record in records
+        ]
+
+    def upsert_rules(self, records):
+        records = sorted(records, key=lambda r: r['level'])
+        write_in_batches(self.driver, SYNC_RULEBOOKS_QUERY, sorted({r['rulebook'] for r in records}), self.batch_size)
+        write_in_batches(self.driver, SYNC_UPSERT_QUERY, records, self.batch_size)
+        write_in_batches(self.driver, SYNC_CATEGORY_LINK_QUERY, [r for r in records if r['level'] == 1], self.batch_size)
+        write_in_batches(self.driver, SYNC_PARENT_LINK_QUERY, [r for r in records if r['level'] > 1], self.batch_size)
+
+    def delete_rules(self, rule_ids):
+        write_in_batches(self.driver, SYNC_DELETE_QUERY, list(rule_ids), self.batch_size)
+
+    def close(self):
+        self.driver.close()
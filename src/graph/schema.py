@@ -0,0 +1,84 @@
+RULE_SEARCH_INDEX = "rule_search_fulltext"
+
+# --- Schema Statements ---
+# Every statement uses IF NOT EXISTS so the bootstrap can be re-run safely.
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT rule_id_unique IF NOT EXISTS FOR (r:Rule) REQUIRE r.rule_id IS UNIQUE",
+    "CREATE CONSTRAINT rulebook_name_unique IF NOT EXISTS FOR (rb:Rulebook) REQUIRE rb.name IS UNIQUE",
+    # Term search (Neo4jBackend.rules_containing) goes through this index; stop words are kept
+    # so every word of a term can be required.
+    f"CREATE FULLTEXT INDEX {RULE_SEARCH_INDEX} IF NOT EXISTS FOR (r:Rule) ON EACH [r.title, r.text] "
+    "OPTIONS {indexConfig: {`fulltext.analyzer`: 'standard-no-stop-words'}}",
+    "CREATE INDEX rule_level_index IF NOT EXISTS FOR (r:Rule) ON (r.level)",
+    # Range indexes: STARTS WITH on the materialized path (subtrees) and ordering by sort key.
+    "CREATE INDEX rule_path_index IF NOT EXISTS FOR (r:Rule) ON (r.path)",
+    "CREATE INDEX rule_sort_key_index IF NOT EXISTS FOR (r:Rule) ON (r.sort_key)",
+]
+
+# Representative lookups and the index operator the planner is expected to pick for each.
+PLAN_CHECKS = [
+    ("Rule by rule_id", "MATCH (n:Rule {rule_id: $value}) RETURN n", "NodeUniqueIndexSeek", "V.1"),
+    ("Rulebook by name", "MATCH (rb:Rulebook {name: $value}) RETURN rb", "NodeUniqueIndexSeek", "Vehicle Requirements"),
+    ("Rule by level", "MATCH (r:Rule) WHERE r.level = $value RETURN r", "NodeIndexSeek", 1),
+    ("Subtree by path prefix", "MATCH (r:Rule) WHERE r.path STARTS WITH $value RETURN r", "NodeIndexSeekByRange", "V.1."),
+    # Fulltext indexes are only reachable through the procedure, so a ProcedureCall (not a label scan) is expected.
+    ("Rules by term", f"CALL db.index.fulltext.queryNodes('{RULE_SEARCH_INDEX}', $value) YIELD node RETURN node",
+     "ProcedureCall", "+aerodynamic*"),
+]
+
+
+def ensure_schema(driver):
+    """Creates the uniqueness constraints and indexes (idempotent) and waits until they are online."""
+    with driver.session() as session:
+        for statement in SCHEMA_STATEMENTS:
+            session.run(statement).consume()
+        session.run("CALL db.awaitIndexes(300)").consume()
+    print(f" Schema ready: {len(SCHEMA_STATEMENTS)} constraints/indexes ensured.")
+
+
+def _plan_operators(plan):
+    """Flattens an EXPLAIN/PROFILE plan tree into its list of operator names."""
+    if not plan:
+        return []
+    operators = [plan.get('operatorType', '')]
+    for child in plan.get('children', []):
+        operators.extend(_plan_operators(child))
+    return operators
+
+
+def verify_index_usage(driver, profile=False):
+    """
+    Runs EXPLAIN (or PROFILE) on the lookups used by ingestion and querying and
+    checks that the planner picks an index seek instead of a label scan.
+    Returns True when every check passes.
+    """
+    keyword = "PROFILE" if profile else "EXPLAIN"
+    all_ok = True
+    with driver.session() as session:
+        for name, query, expected, value in PLAN_CHECKS:
+            summary = session.run(f"{keyword} {query}", value=value).consume()
+            plan = summary.profile if profile else summary.plan
+            operators = _plan_operators(plan)
+            used_index = any(expected in op for op in operators)
+            all_ok = all_ok and used_index
+            status = "OK" if used_index else "NOT USING INDEX"
+            print(f"   [{status}] {name}: {' <- '.join(operators)}")
+    return all_ok
+
+
+if __name__ == "__main__":
+    # Standalone usage: python -m src.graph.schema
+    from neo4j import GraphDatabase
+    from src.config import get_neo4j_credentials
+
+    NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD = get_neo4j_credentials()
+
+    if not all([NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD]):
+        print(" Error: Neo4j credentials not found in ./config/.env file!")
+    else:
+        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+        try:
+            ensure_schema(driver)
+            verify_index_usage(driver, profile=True)
+        finally:
+            driver.close()
@@ -0,0 +1,166 @@
+import json
+import sqlite3
+import threading
+from src.graph.backends import KnowledgeGraphBackend, RuleRecord, term_matches
+from src.graph.kg_ingestion import rule_path, rule_sort_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rulebooks (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS rules (
+    rule_id TEXT PRIMARY KEY,
+    level INTEGER,
+    parent_id TEXT,
+    rulebook TEXT REFERENCES rulebooks(name),
+    title TEXT,
+    text TEXT,
+    content_hash TEXT,
+    path TEXT,
+    sort_key TEXT
+);
+-- Trigram tokens make MATCH behave like a case-insensitive substring search (Cypher CONTAINS).
+CREATE VIRTUAL TABLE IF NOT EXISTS rules_fts USING fts5(rule_id UNINDEXED, title, text, tokenize='trigram');
+"""
+
+# Created after the migration below so stores written before path/sort_key existed still open.
+INDEXES = """
+CREATE INDEX IF NOT EXISTS rules_parent_idx ON rules(parent_id);
+CREATE INDEX IF NOT EXISTS rules_level_idx ON rules(level);
+CREATE INDEX IF NOT EXISTS rules_path_idx ON rules(path);
+CREATE INDEX IF NOT EXISTS rules_sort_key_idx ON rules(sort_key);
+"""
+
+# Every path of the subtree of 'V.1.' lies in ['V.1.', 'V.1/'), '/' being the character after '.'.
+PATH_UPPER_BOUND = chr(ord('.') + 1)
+
+
+class SQLiteBackend(KnowledgeGraphBackend):
+    """
+    Embedded, in-process knowledge graph: rules in a SQLite table (hierarchy via parent_id)
+    plus an FTS5 trigram index for term search. Use ':memory:' for a throwaway store or a
+    file path to persist it between runs.
+    """
+    def __init__(self, path=":memory:"):
+        self.path = path
+        # A single connection shared by the benchmark's worker threads, guarded by a lock.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._add_hierarchy_columns()
+        self._conn.executescript(INDEXES)
+        self._lock = threading.Lock()
+
+    def _add_hierarchy_columns(self):
+        """Adds and backfills path/sort_key in a store created before they existed."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(rules)")}
+        if {'path', 'sort_key'} <= columns:
+            return
+        with self._conn:
+            for column in ('path', 'sort_key'):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE rules ADD COLUMN {column} TEXT")
+            rule_ids = [row[0] for row in self._conn.execute("SELECT rule_id FROM rules")]
+            self._conn.executemany("UPDATE rules SET path = ?, sort_key = ? WHERE rule_id = ?",
+                                   [(rule_path(rule_id), rule_sort_key(rule_id), rule_id) for rule_id in rule_ids])
+
+    def get_rule(self, rule_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT title, text, level, parent_id FROM rules WHERE rule_id = ?", (rule_id,)
+            ).fetchone()
+        return RuleRecord(*row) if row else None
+
+    def all_rules(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT rule_id, title, text, level, parent_id FROM rules").fetchall()
+        return {rule_id: RuleRecord(title, text, level, parent) for rule_id, title, text, level, parent in rows}
+
+    def get_rules(self, rule_ids):
+        with self._lock:
+            # The ids are passed as one JSON array so any number of them fits in a single statement.
+            rows = self._conn.execute(
+                "SELECT rule_id, title, text, level, parent_id FROM rules "
+                "WHERE rule_id IN (SELECT value FROM json_each(?))", (json.dumps(list(rule_ids)),)
+            ).fetchall()
+        return {rule_id: RuleRecord(title, text, level, parent) for rule_id, title, text, level, parent in rows}
+
+    def rules_containing(self, substrings):
+        # In-process, so one FTS lookup per substring costs no round trips.
+        return {substring: self._rules_containing(substring) for substring in substrings}
+
+    def _rules_containing(self, term):
+        with self._lock:
+            if len(term) >= 3:
+                # Quoted as a single FTS5 string so punctuation in the term is matched literally.
+                rows = self._conn.execute(
+                    "SELECT r.rule_id, r.title, r.text FROM rules_fts JOIN rules r ON r.rowid = rules_fts.rowid "
+                    "WHERE rules_fts MATCH ? ORDER BY r.sort_key",
+                    ('"' + term.replace('"', '""') + '"',)
+                ).fetchall()
+            else:
+                # Trigrams cannot match terms shorter than three characters.
+                pattern = f"%{term.lower()}%"
+                rows = self._conn.execute(
+                    "SELECT rule_id, title, text FROM rules WHERE lower(title) LIKE ? OR lower(text) LIKE ? "
+                    "ORDER BY sort_key", (pattern, pattern)
+                ).fetchall()
+        # The substring search finds the candidates; term_matches drops mid-word matches.
+        return [rule_id for rule_id, title, text in rows if term_matches(term, title, text)]
+
+    def children_of(self, rule_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rule_id FROM rules WHERE parent_id = ? ORDER BY sort_key", (rule_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def subtree(self, rule_id):
+        path = rule_path(rule_id)
+        with self._lock:
+            # A range scan on rules_path_idx; the result is re-ordered by the sort key.
+            rows = self._conn.execute(
+                "SELECT rule_id, title, text, level, parent_id FROM rules "
+                "WHERE path >= ? AND path < ? ORDER BY sort_key",
+                (path, path[:-1] + PATH_UPPER_BOUND)
+            ).fetchall()
+        return [(row[0], RuleRecord(*row[1:])) for row in rows]
+
+    def upsert_rules(self, records):
+        rows = [
+            (r['rule_id'], r['level'], r.get('parent_id'), r['rulebook'], r.get('title'), r.get('text'),
+             r.get('content_hash'), rule_path(r['rule_id']), rule_sort_key(r['rule_id']))
+            for r in records
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO rulebooks (name) VALUES (?)",
+                                   [(name,) for name in {r['rulebook'] for r in records}])
+            # ON CONFLICT keeps each rule's rowid stable, which is also its rowid in rules_fts.
+            self._conn.executemany(
+                "INSERT INTO rules (rule_id, level, parent_id, rulebook, title, text, content_hash, path, sort_key) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(rule_id) DO UPDATE SET "
+                "level = excluded.level, parent_id = excluded.parent_id, rulebook = excluded.rulebook, "
+                "title = excluded.title, text = excluded.text, content_hash = excluded.content_hash, "
+                "path = excluded.path, sort_key = excluded.sort_key", rows
+            )
+            rule_ids = [(row[0],) for row in rows]
+            self._conn.executemany(
+                "DELETE FROM rules_fts WHERE rowid = (SELECT rowid FROM rules WHERE rule_id = ?)", rule_ids
+            )
+            self._conn.executemany(
+                "INSERT INTO rules_fts (rowid, rule_id, title, text) "
+                "SELECT rowid, rule_id, title, text FROM rules WHERE rule_id = ?", rule_ids
+            )
+
+    def delete_rules(self, rule_ids):
+        ids = json.dumps(list(rule_ids))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM rules_fts WHERE rowid IN "
+                "(SELECT rowid FROM rules WHERE rule_id IN (SELECT value FROM json_each(?)))", (ids,)
+            )
+            self._conn.execute("DELETE FROM rules WHERE rule_id IN (SELECT value FROM json_each(?))", (ids,))
+            self._conn.execute("DELETE FROM rulebooks WHERE name NOT IN (SELECT rulebook FROM rules)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,21 +1,33 @@
 import fitz  # The PyMuPDF library
+import os
 import pandas as pd
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import re
 
+# --- Precompiled Patterns ---
+FOOTER_PATTERNS = [
+    re.compile(r'^Formula SAE®? Rules \d{4}$'),
+    re.compile(r'^© \d{4} SAE International$'),
+    re.compile(r'^Page \d+ of \d+$'),
+    re.compile(r'^Version \d\.\d\s+\d{1,2}\s\w+\s\d{4}$')
+]
+TOC_TITLE_PATTERN = re.compile(r'^([A-Z]{1,})\s+-\s+(.+)', re.MULTILINE)
+TOC_DOTS_PATTERN = re.compile(r'\.{5,}')
+RULE_HEADING_PATTERN = re.compile(r'^[A-Z]{1,2}\.\d{1,2}(?:\.\d{1,2})*\s')
+
+# Height (in PDF points) of the horizontal bands used to bucket link rectangles.
+LINK_BAND_HEIGHT = 40.0
+# Pages per work unit handed to each extraction process.
+PAGES_PER_CHUNK = 8
+
 def is_footer_line(line):
     """
     Checks if a given line of text matches known footer patterns using regular expressions.
     This handles dynamic content like page numbers and dates.
     """
     line = line.strip()
-    footer_patterns = [
-        re.compile(r'^Formula SAE®? Rules \d{4}$'),
-        re.compile(r'^© \d{4} SAE International$'),
-        re.compile(r'^Page \d+ of \d+$'),
-        re.compile(r'^Version \d\.\d\s+\d{1,2}\s\w+\s\d{4}$')
-    ]
-    for pattern in footer_patterns:
+    for pattern in FOOTER_PATTERNS:
         if pattern.match(line):
             return True
     return False
@@ -35,100 +47,148 @@ def clean_rule_text(text):
     text = text.replace('\n', ' ')
     return text
 
-def extract_rules_from_pdf(pdf_path):
-    """
-    Extracts rules, titles, and text from a PDF document.
-    """
-    doc = fitz.open(pdf_path)
-    rules_data = []
+def extract_category_titles(doc):
+    """Scans the Table of Contents for the main category titles (e.g. {'V': 'Vehicle Requirements'})."""
     category_titles = {}
-    current_rule_text = ""
-    current_rule_number = None
-
-    print("Scanning Table of Contents for category titles...")
-    toc_title_pattern = re.compile(r'^([A-Z]{1,})\s+-\s+(.+)', re.MULTILINE)
     for page_num in range(min(20, len(doc))):
         page_text = doc[page_num].get_text()
-        matches = toc_title_pattern.findall(page_text)
+        matches = TOC_TITLE_PATTERN.findall(page_text)
         for code, title in matches:
             clean_title = title.split('..')[0].strip()
             if code not in category_titles:
                 category_titles[code] = clean_title
-    print(f"Found {len(category_titles)} main category titles.")
+    return category_titles
 
-    def _find_content_start_page(doc):
-        toc_pattern = re.compile(r'\.{5,}')
-        last_toc_page = 0
-        for page_num in range(min(20, len(doc))):
-            page = doc[page_num]
-            if toc_pattern.search(page.get_text()):
-                last_toc_page = page_num
-        start_page = last_toc_page + 1
-        print(f"Dynamically found end of Table of Contents on page {last_toc_page + 1}.")
-        print(f"Starting main content extraction from page {start_page + 1}.")
-        return start_page
-
-    rule_heading_pattern = re.compile(r'^[A-Z]{1,2}\.\d{1,2}(?:\.\d{1,2})*\s')
-    start_page = _find_content_start_page(doc)
-
-    for page_num in range(start_page, len(doc)):
+def find_content_start_page(doc):
+    """Returns the first page after the Table of Contents."""
+    last_toc_page = 0
+    for page_num in range(min(20, len(doc))):
         page = doc[page_num]
-        links = page.get_links()
-        link_rects = [link['from'] for link in links]
-        blocks = page.get_text("blocks")
-        for block in blocks:
-            if block[6] != 0: continue
-            
-            block_rect = fitz.Rect(block[:4])
-            is_hyperlink = any(r.intersects(block_rect) for r in link_rects)
+        if TOC_DOTS_PATTERN.search(page.get_text()):
+            last_toc_page = page_num
+    start_page = last_toc_page + 1
+    print(f"Dynamically found end of Table of Contents on page {last_toc_page + 1}.")
+    print(f"Starting main content extraction from page {start_page + 1}.")
+    return start_page
+
+class LinkIndex:
+    """Buckets a page's hyperlink rectangles into horizontal bands so a block is only tested against nearby links."""
+    def __init__(self, link_rects, band_height=LINK_BAND_HEIGHT):
+        self.band_height = band_height
+        self.bands = {}
+        for rect in link_rects:
+            for band in self._bands_for(rect):
+                self.bands.setdefault(band, []).append(rect)
+
+    def _bands_for(self, rect):
+        return range(int(rect.y0 // self.band_height), int(rect.y1 // self.band_height) + 1)
+
+    def intersects(self, block_rect):
+        for band in self._bands_for(block_rect):
+            for rect in self.bands.get(band, ()):
+                if rect.intersects(block_rect):
+                    return True
+        return False
+
+def scan_page_blocks(page):
+    """
+    Converts one page into the state-independent part of the extraction: a list of
+    (is_hyperlink, lines) per text block, where each line is (rule_number or None, text)
+    and footer lines are already removed.
+    """
+    link_index = LinkIndex([link['from'] for link in page.get_links()])
+    blocks = []
+    for block in page.get_text("blocks"):
+        if block[6] != 0: continue
+        is_hyperlink = link_index.intersects(fitz.Rect(block[:4]))
+        lines = []
+        for line in block[4].split('\n'):
+            if is_footer_line(line):
+                continue
+            if RULE_HEADING_PATTERN.match(line):
+                words = line.split()
+                lines.append((words[0], ' '.join(words[1:])))
+            else:
+                lines.append((None, line))
+        blocks.append((is_hyperlink, lines))
+    return blocks
 
+def scan_page_range(pdf_path, start_page, end_page):
+    """Worker entry point: scans pages [start_page, end_page) of the PDF in a separate process."""
+    with fitz.open(pdf_path) as doc:
+        return [scan_page_blocks(doc[page_num]) for page_num in range(start_page, end_page)]
+
+def split_rule_title(rule_num, full_text):
+    """Splits a finalized rule into its title and body based on its depth."""
+    num_dots = rule_num.count('.')
+    if num_dots <= 2 and '\n' in full_text:
+        parts = full_text.split('\n', 1)
+        title, body = parts[0].strip(), parts[1].strip()
+    elif num_dots >= 3:
+        title, body = "", full_text.strip()
+    else:
+        title, body = full_text.strip(), ""
+    return {'rule_num': rule_num, 'rule_title': title, 'rule_text': body}
+
+def _scanned_pages(pdf_path, start_page, page_count, workers):
+    """Yields scanned pages in document order, using a process pool when `workers` > 1."""
+    if workers <= 1:
+        yield from scan_page_range(pdf_path, start_page, page_count)
+        return
+    chunks = [(first, min(first + PAGES_PER_CHUNK, page_count))
+              for first in range(start_page, page_count, PAGES_PER_CHUNK)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() returns chunks in submission order, so the stitching below stays deterministic.
+        results = executor.map(scan_page_range, [pdf_path] * len(chunks),
+                               [first for first, _ in chunks], [last for _, last in chunks])
+        for pages in results:
+            yield from pages
+
+def iter_rules_from_pdf(pdf_path, workers=None):
+    """
+    Generator over the rules of the PDF, yielding {'rule_num', 'rule_title', 'rule_text'}
+    dicts as soon as each rule is finalized. Pages are scanned in parallel; rules that
+    continue across page boundaries are stitched together here in page order.
+    """
+    workers = workers or os.cpu_count() or 1
+    with fitz.open(pdf_path) as doc:
+        start_page = find_content_start_page(doc)
+        page_count = len(doc)
+
+    current_rule_number = None
+    current_parts = []
+    for blocks in _scanned_pages(pdf_path, start_page, page_count, workers):
+        for is_hyperlink, lines in blocks:
             if is_hyperlink:
-                process_this_block = False
-                new_rule_num_in_block = None
-                block_text_peek = block[4]
-                for line in block_text_peek.split('\n'):
-                    match = rule_heading_pattern.match(line)
-                    if match:
-                        new_rule_num_in_block = line.split()[0]
-                        break
+                # Hyperlinked blocks (cross references) are only kept inside level-3+ rules.
+                new_rule_num_in_block = next((num for num, _ in lines if num), None)
                 if new_rule_num_in_block:
-                    if new_rule_num_in_block.count('.') >= 3:
-                        process_this_block = True
+                    process_this_block = new_rule_num_in_block.count('.') >= 3
                 else:
-                    if current_rule_number and current_rule_number.count('.') >= 3:
-                        process_this_block = True
+                    process_this_block = bool(current_rule_number) and current_rule_number.count('.') >= 3
                 if not process_this_block:
                     continue
 
-            block_text = block[4]
-            lines = block_text.split('\n')
-            for line in lines:
-                if is_footer_line(line):
-                    continue
-
-                match = rule_heading_pattern.match(line)
-                if match:
+            for rule_num, text in lines:
+                if rule_num:
                     if current_rule_number:
-                        rules_data.append({'rule_num': current_rule_number, 'rule_text': current_rule_text.strip()})
-                    current_rule_number = line.split()[0]
-                    current_rule_text = ' '.join(line.split()[1:])
+                        yield split_rule_title(current_rule_number, "\n".join(current_parts).strip())
+                    current_rule_number = rule_num
+                    current_parts = [text]
                 elif current_rule_number:
-                    current_rule_text += "\n" + line
+                    current_parts.append(text)
 
     if current_rule_number:
-        rules_data.append({'rule_num': current_rule_number, 'rule_text': current_rule_text.strip()})
-
-    processed_rules = []
-    for rule in rules_data:
-        rule_num, full_text = rule['rule_num'], rule['rule_text']
-        num_dots = rule_num.count('.')
-        if num_dots <= 2 and '\n' in full_text:
-            parts = full_text.split('\n', 1)
-            title, body = parts[0].strip(), parts[1].strip()
-        elif num_dots >= 3:
-            title, body = "", full_text.strip()
-        else:
-            title, body = full_text.strip(), ""
-        processed_rules.append({'rule_num': rule_num, 'rule_title': title, 'rule_text': body})
-
-    return pd.DataFrame(processed_rules), category_titles
\ No newline at end of file
+        yield split_rule_title(current_rule_number, "\n".join(current_parts).strip())
+
+def extract_rules_from_pdf(pdf_path, workers=None):
+    """
+    Extracts rules, titles, and text from a PDF document.
+    """
+    print("Scanning Table of Contents for category titles...")
+    with fitz.open(pdf_path) as doc:
+        category_titles = extract_category_titles(doc)
+    print(f"Found {len(category_titles)} main category titles.")
+
+    processed_rules = list(iter_rules_from_pdf(pdf_path, workers=workers))
+    return pd.DataFrame(processed_rules), category_titles
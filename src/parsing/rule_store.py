@@ -0,0 +1,74 @@
+import re
+import json
+from pathlib import Path
+
+# Arrow IPC (Feather v2) file holding every rule; written uncompressed so it can be memory-mapped.
+RULE_STORE_PATH = Path("structured_rules") / "rules.arrow"
+# Raw output of the PDF extraction step, with the category titles kept in the schema metadata.
+EXTRACTED_RULES_PATH = Path("structured_rules") / "extracted_rules.arrow"
+
+RULE_STORE_COLUMNS = ['rule_num', 'level', 'parent', 'category', 'rulebook', 'title', 'text']
+
+
+def rulebook_name_for(category, category_titles):
+    """Rulebook name for a category, matching the name parsed from the Excel filenames."""
+    main_title = category_titles.get(category, f"{category} Regulations")
+    return re.sub(r'[\\/*?:"<>|]', "", main_title)
+
+
+def build_rule_table(rules_df, category_titles):
+    """
+    Builds the single rule table shared by the Excel export and the graph ingestion
+    from the level frames of build_rule_hierarchy, in the original rule order.
+    """
+    import pandas as pd
+    from src.parsing.structred_excel_files import build_rule_hierarchy
+
+    table = pd.concat(build_rule_hierarchy(rules_df).values()).sort_index()
+    rulebooks = {category: rulebook_name_for(category, category_titles) for category in table['category'].unique()}
+    table['rulebook'] = table['category'].map(rulebooks)
+    return table[RULE_STORE_COLUMNS].reset_index(drop=True)
+
+
+def write_rule_store(rule_table, path=RULE_STORE_PATH):
+    """Writes the rule table as an uncompressed Arrow IPC file."""
+    from pyarrow import feather
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    feather.write_feather(rule_table, str(path), compression='uncompressed')
+    print(f"   -> Saved {len(rule_table)} rules to {path}")
+
+
+def read_rule_store(path=RULE_STORE_PATH, columns=None, memory_map=True):
+    """
+    Loads the rule table (only `columns`, if given) as a pyarrow Table. With `memory_map=True`
+    the Arrow buffers are mapped instead of read; call .to_pandas() only where a DataFrame is needed,
+    since it copies every column.
+    """
+    from pyarrow import feather
+
+    return feather.read_table(str(path), columns=columns, memory_map=memory_map)
+
+
+def write_extracted_rules(rules_df, category_titles, path=EXTRACTED_RULES_PATH):
+    """Saves the raw extracted rules (and category titles) so structuring can run as a separate step."""
+    import pyarrow as pa
+    from pyarrow import feather
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(rules_df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'category_titles'] = json.dumps(category_titles).encode('utf-8')
+    feather.write_feather(table.replace_schema_metadata(metadata), str(path), compression='uncompressed')
+    print(f"   -> Saved {len(rules_df)} extracted rules to {path}")
+
+
+def read_extracted_rules(path=EXTRACTED_RULES_PATH):
+    """Loads the output of write_extracted_rules as (rules_df, category_titles)."""
+    from pyarrow import feather
+
+    table = feather.read_table(str(path), memory_map=True)
+    category_titles = json.loads(table.schema.metadata[b'category_titles'])
+    return table.to_pandas(), category_titles
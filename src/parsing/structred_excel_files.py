@@ -1,7 +1,13 @@
 import pandas as pd
 from pathlib import Path
 import re
-from src.parsing.extract_rules_from_pdf import clean_rule_text
+
+# Column names used for each level's sheet in the Excel export.
+EXCEL_SHEET_COLUMNS = {
+    1: {'rule_num': 'Level1_rule_number', 'title': 'Level1_rule_title'},
+    2: {'rule_num': 'Level2_rule_number', 'title': 'Level2_rule_title', 'text': 'Level2_rule_text'},
+    3: {'rule_num': 'Level3_rule_number', 'text': 'Level3_rule_text'},
+}
 
 def is_title_case(s):
     """Checks if a string is in title case (e.g., 'General Regulations')."""
@@ -27,12 +33,49 @@ def split_title_and_text(text):
     else:
         return "", text
 
+def clean_rule_text_series(texts):
+    """Vectorized clean_rule_text: same replacements, in the same order, over a whole column."""
+    return (texts.str.replace('\n\n\n', '  \n', regex=False)
+                 .str.replace('\n\n', ' \n', regex=False)
+                 .str.replace('\n', ' ', regex=False))
+
+def build_rule_hierarchy(rules_df):
+    """
+    Derives the Level1/Level2/Level3 hierarchy from the extracted rules in columnar passes.
+    Returns {level: DataFrame} with columns rule_num, level, parent, category, title and text
+    (indexed like `rules_df`), where level 1 keeps only a title, level 2 a title and cleaned
+    text, and level 3+ rules fold their title into the cleaned text.
+    """
+    rule_num = rules_df['rule_num'].astype(str)
+    num_dots = rule_num.str.count(r'\.')
+    frame = pd.DataFrame({
+        'rule_num': rule_num,
+        'level': num_dots.clip(upper=3).astype('int8'),
+        'parent': rule_num.str.rsplit('.', n=1).str[0],
+        'category': rule_num.str.split('.', n=1).str[0],
+        'title': rules_df['rule_title'],
+        'text': rules_df['rule_text'],
+    })
+    frame = frame[frame['level'] >= 1]
+
+    level1, level3 = frame['level'] == 1, frame['level'] == 3
+    frame.loc[level3, 'text'] = (frame.loc[level3, 'title'] + ' ' + frame.loc[level3, 'text']).str.strip()
+    frame.loc[~level1, 'text'] = clean_rule_text_series(frame.loc[~level1, 'text'])
+    frame.loc[level1, ['parent', 'text']] = None
+    frame.loc[level3, 'title'] = None
+
+    return {int(level): group for level, group in frame.groupby('level', sort=True)}
+
 def create_structured_excel_files(rules_df, category_titles):
     """
     Processes a DataFrame of rules and organizes them into hierarchical Excel files.
     """
-    rules_df['main_category'] = rules_df['rule_num'].apply(lambda x: x.split('.')[0])
-    main_categories = rules_df['main_category'].unique()
+    levels = build_rule_hierarchy(rules_df)
+    main_categories = pd.concat(levels.values()).sort_index()['category'].unique()
+    by_category = {
+        level: dict(tuple(frame.groupby('category', sort=False)))
+        for level, frame in levels.items()
+    }
 
     output_dir = Path("structured_rules")
     output_dir.mkdir(exist_ok=True)
@@ -40,34 +83,13 @@ def create_structured_excel_files(rules_df, category_titles):
 
     for category in main_categories:
         print(f"Processing category: {category}...")
-        category_df = rules_df[rules_df['main_category'] == category].copy()
         main_title = category_titles.get(category, f"{category} Regulations")
         safe_filename = re.sub(r'[\\/*?:"<>|]', "", f"{category} - {main_title}.xlsx")
         excel_path = output_dir / safe_filename
 
-        level1_data, level2_data, level3_data = [], [], []
-
-        for _, row in category_df.iterrows():
-            rule_num, title, body = row['rule_num'], row['rule_title'], row['rule_text']
-            num_dots = rule_num.count('.')
-
-            if num_dots == 1:
-                level1_data.append({'Level1_rule_number': rule_num, 'Level1_rule_title': title})
-            elif num_dots == 2:
-                # --- APPLY TEXT CLEANING FOR LEVEL 2 ---
-                cleaned_body = clean_rule_text(body)
-                level2_data.append({'Level2_rule_number': rule_num, 'Level2_rule_title': title, 'Level2_rule_text': cleaned_body})
-            elif num_dots >= 3:
-                full_text = f"{title} {body}".strip()
-                # --- APPLY TEXT CLEANING FOR LEVEL 3 ---
-                cleaned_full_text = clean_rule_text(full_text)
-                level3_data.append({'Level3_rule_number': rule_num, 'Level3_rule_text': cleaned_full_text})
-
         with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-            if level1_data:
-                pd.DataFrame(level1_data).to_excel(writer, sheet_name='Level1', index=False)
-            if level2_data:
-                pd.DataFrame(level2_data).to_excel(writer, sheet_name='Level2', index=False)
-            if level3_data:
-                pd.DataFrame(level3_data).to_excel(writer, sheet_name='Level3', index=False)
-        print(f"   -> Saved {safe_filename}")
\ No newline at end of file
+            for level, columns in EXCEL_SHEET_COLUMNS.items():
+                level_df = by_category.get(level, {}).get(category)
+                if level_df is not None and not level_df.empty:
+                    level_df[list(columns)].rename(columns=columns).to_excel(writer, sheet_name=f'Level{level}', index=False)
+        print(f"   -> Saved {safe_filename}")
@@ -0,0 +1,173 @@
+"""
+Stand-in for the VLLM OpenAI-compatible server, for exercising the client's latency controls
+(deadlines, retries, hedging) without a GPU. Answers /v1/chat/completions, streamed (SSE) or
+not, after an injected delay, and can make a fraction of requests slow, fail or drop.
+
+    python -m src.rag_query.fake_vllm_server --port 8001 --delay 0.2 --slow-rate 0.1 --slow-delay 5
+    # then set VLLM_API_URL=http://localhost:8001/v1 in ./config/.env
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8001
+DEFAULT_ANSWER = "Explanation: The dimension shown complies with the rule.\nAnswer: yes"
+
+
+class FakeVLLMServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the fault-injection settings and request counters."""
+    daemon_threads = True
+
+    def __init__(self, address, delay=0.0, token_delay=0.0, slow_rate=0.0, slow_delay=0.0,
+                 error_rate=0.0, drop_rate=0.0, answer=DEFAULT_ANSWER, model="fake-model", seed=None):
+        super().__init__(address, FakeVLLMHandler)
+        self.delay = delay
+        self.token_delay = token_delay
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.answer = answer
+        self.model = model
+        self.random = random.Random(seed)
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    def draw(self):
+        """Picks the fate of one request: 'error', 'drop', 'slow' or 'ok'."""
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.error_rate:
+            return "error"
+        if roll < self.error_rate + self.drop_rate:
+            return "drop"
+        if roll < self.error_rate + self.drop_rate + self.slow_rate:
+            return "slow"
+        return "ok"
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+
+class FakeVLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": self.server.model, "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        request = json.loads(body or b"{}")
+        server = self.server
+        server.count("requests")
+        fate = server.draw()
+        server.count(fate)
+
+        # --- 1. Injected failures ---
+        if fate == "error":
+            self._send_json(503, {"error": {"message": "injected overload", "type": "server_error"}})
+            return
+        if fate == "drop":
+            self.close_connection = True
+            self.connection.close()
+            return
+
+        # --- 2. Injected latency before the first token ---
+        time.sleep(server.delay + (server.slow_delay if fate == "slow" else 0.0))
+
+        # --- 3. Answer, streamed word by word or in one response ---
+        words = server.answer.split(" ")
+        words = words[:max(1, int(request.get("max_tokens") or len(words)))]
+        if request.get("stream"):
+            self._stream(words, request)
+        else:
+            self._send_json(200, self._completion(" ".join(words)))
+
+    def _completion(self, text):
+        return {
+            "id": f"chatcmpl-{random.getrandbits(32):08x}", "object": "chat.completion",
+            "created": int(time.time()), "model": self.server.model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(text.split()), "total_tokens": len(text.split())},
+        }
+
+    def _stream(self, words, request):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        chunk_id = f"chatcmpl-{random.getrandbits(32):08x}"
+        try:
+            for i, word in enumerate(words):
+                delta = {"content": word if i == 0 else " " + word}
+                self._event({"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": self.server.model,
+                             "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                time.sleep(self.server.token_delay)
+            self._event({"id": chunk_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": self.server.model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream (early stop, deadline or a hedged duplicate won).
+            self.server.count("cancelled")
+
+    def _event(self, payload):
+        self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_server(port=0, **settings):
+    """Starts a FakeVLLMServer on a background thread; returns (server, base_url)."""
+    server = FakeVLLMServer(("127.0.0.1", port), **settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible VLLM server with injected delay and faults.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds before the first token of every request.")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed words.")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="Fraction of requests given --slow-delay extra.")
+    parser.add_argument("--slow-delay", type=float, default=0.0, help="Extra seconds for slow requests (the tail).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 503.")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of connections closed without a reply.")
+    parser.add_argument("--answer", default=DEFAULT_ANSWER, help="Text returned for every request.")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    server = FakeVLLMServer(("0.0.0.0", args.port), delay=args.delay, token_delay=args.token_delay,
+                            slow_rate=args.slow_rate, slow_delay=args.slow_delay, error_rate=args.error_rate,
+                            drop_rate=args.drop_rate, answer=args.answer, seed=args.seed)
+    print(f"🧪 Fake VLLM server listening on http://localhost:{args.port}/v1 (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Requests served: {dict(server.counters)}")
+        server.server_close()
@@ -0,0 +1,158 @@
+import os
+import io
+import json
+import base64
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path('.') / '.cache' / 'images'
+# LLaVA-1.5 resizes inputs to 336px on the server, so larger images only inflate the payload.
+DEFAULT_MAX_SIDE = 1024
+DEFAULT_JPEG_QUALITY = 90
+
+
+def hash_file(image_path):
+    """SHA-256 of the raw image bytes, used as the content address."""
+    digest = hashlib.sha256()
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_image(image_path, max_side=DEFAULT_MAX_SIDE, quality=DEFAULT_JPEG_QUALITY):
+    """
+    Converts an image to RGB, downscales it so its longest side is at most `max_side`
+    and re-encodes it as a base64 JPEG. Returns (base64_payload, bytes_before, bytes_after).
+    Module-level so it can run in a process pool.
+    """
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        if img.mode != 'RGB': img = img.convert('RGB')
+        if max_side and max(img.size) > max_side:
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffered = io.BytesIO()
+        img.save(buffered, format="JPEG", quality=quality)
+        jpeg_bytes = buffered.getvalue()
+    return base64.b64encode(jpeg_bytes).decode('utf-8'), os.path.getsize(image_path), len(jpeg_bytes)
+
+
+def write_atomic(path, text):
+    """Writes `text` to a temporary file next to `path` and renames it, so readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ImageCache:
+    """
+    Content-addressed cache of preprocessed, base64-encoded images.
+    Entries are keyed by the image's SHA-256 plus the resize/quality settings and are
+    kept in memory and under `cache_dir` (`<key>.b64` payload, `<key>.json` sizes),
+    so identical drawings are only encoded once.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_side=DEFAULT_MAX_SIDE, quality=DEFAULT_JPEG_QUALITY):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_side = max_side
+        self.quality = quality
+        self._payloads = {}
+        self._hashes = {}
+        self.sizes = {}
+        self._lock = threading.Lock()
+
+    def content_hash(self, image_path):
+        """Returns the image's content hash, memoized per (path, size, mtime)."""
+        stat = os.stat(image_path)
+        key = (os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if key in self._hashes:
+                return self._hashes[key]
+        digest = hash_file(image_path)
+        with self._lock:
+            self._hashes[key] = digest
+        return digest
+
+    def _cache_key(self, digest):
+        return f"{digest}_{self.max_side}_q{self.quality}"
+
+    def payload_key(self, image_path):
+        """Identifies the exact payload sent for `image_path` (content hash + preprocessing settings)."""
+        return self._cache_key(self.content_hash(image_path))
+
+    def _store(self, key, payload, bytes_before, bytes_after, write_disk=True):
+        with self._lock:
+            self._payloads[key] = payload
+            self.sizes[key] = (bytes_before, bytes_after)
+        if write_disk:
+            # Sizes first: a payload on disk always has its sizes next to it.
+            write_atomic(self.cache_dir / f"{key}.json",
+                         json.dumps({'bytes_before': bytes_before, 'bytes_after': bytes_after}))
+            write_atomic(self.cache_dir / f"{key}.b64", payload)
+
+    def _load_from_disk(self, key):
+        disk_path = self.cache_dir / f"{key}.b64"
+        if not disk_path.exists():
+            return None
+        payload = disk_path.read_text()
+        sizes_path = self.cache_dir / f"{key}.json"
+        sizes = json.loads(sizes_path.read_text()) if sizes_path.exists() else None
+        with self._lock:
+            self._payloads[key] = payload
+            if sizes is not None:
+                self.sizes[key] = (sizes['bytes_before'], sizes['bytes_after'])
+        return payload
+
+    def get(self, image_path):
+        """Returns the base64 JPEG payload for `image_path`, encoding it only on a cache miss."""
+        key = self.payload_key(image_path)
+        with self._lock:
+            if key in self._payloads:
+                return self._payloads[key]
+        payload = self._load_from_disk(key)
+        if payload is not None:
+            return payload
+        payload, bytes_before, bytes_after = encode_image(image_path, self.max_side, self.quality)
+        self._store(key, payload, bytes_before, bytes_after)
+        return payload
+
+    def prefetch(self, image_paths, workers=None):
+        """Encodes every not-yet-cached image in a process pool ahead of the request loop."""
+        todo = {}
+        for image_path in dict.fromkeys(image_paths):
+            if not os.path.exists(image_path):
+                continue
+            key = self.payload_key(image_path)
+            if key not in self._payloads and self._load_from_disk(key) is None:
+                todo.setdefault(key, image_path)
+        if not todo:
+            return
+        print(f" Encoding {len(todo)} unique image(s) in a process pool...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(encode_image, todo.values(),
+                                   [self.max_side] * len(todo), [self.quality] * len(todo))
+            for key, (payload, bytes_before, bytes_after) in zip(todo, results):
+                self._store(key, payload, bytes_before, bytes_after)
+
+    def report(self):
+        """Prints per-image bytes before/after preprocessing for the images used in this run (encoded or from disk)."""
+        with self._lock:
+            sizes = dict(self.sizes)
+        if not sizes:
+            return
+        total_before = sum(before for before, _ in sizes.values())
+        total_after = sum(after for _, after in sizes.values())
+        print(f"\nImage preprocessing (max_side={self.max_side}, quality={self.quality}):")
+        for key, (before, after) in sizes.items():
+            print(f"   {key[:12]}: {before / 1024:.1f} KiB -> {after / 1024:.1f} KiB")
+        print(f"   Total: {total_before / 1024:.1f} KiB -> {total_after / 1024:.1f} KiB "
+              f"({len(sizes)} unique images)")
@@ -0,0 +1,84 @@
+import csv
+import math
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+REPORT_PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class PipelineMetrics:
+    """
+    Thread-safe latency recorder for the RAG pipeline.
+    Timings are stored per (subset, stage), e.g. ('presence', 'kg_lookup'), and summarized
+    into p50/p95/p99 and throughput by report().
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._started_at = time.perf_counter()
+
+    def record(self, stage, seconds, subset=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._samples.setdefault((subset or "all", stage), []).append(seconds)
+
+    def timer(self, stage, subset=None):
+        """Context manager recording the wall time of its body under `stage`."""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(stage, subset)
+
+    @contextmanager
+    def _timed(self, stage, subset):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, subset)
+
+    def report(self):
+        """Returns one summary row per (subset, stage) with latency percentiles (ms) and throughput."""
+        elapsed = time.perf_counter() - self._started_at
+        with self._lock:
+            samples = {key: sorted(values) for key, values in self._samples.items()}
+        rows = []
+        for (subset, stage), values in sorted(samples.items()):
+            row = {
+                "subset": subset,
+                "stage": stage,
+                "count": len(values),
+                "mean_ms": 1000 * sum(values) / len(values),
+                "max_ms": 1000 * values[-1],
+                "throughput_per_s": len(values) / elapsed if elapsed else 0.0,
+            }
+            for pct in REPORT_PERCENTILES:
+                row[f"p{pct}_ms"] = 1000 * percentile(values, pct)
+            rows.append(row)
+        return rows
+
+    def write_report(self, output_dir, name="latency_report"):
+        """Writes the report as <name>.json and <name>.csv into `output_dir`."""
+        rows = self.report()
+        if not rows:
+            return
+        output_dir = Path(output_dir)
+        with open(output_dir / f"{name}.json", "w") as f:
+            json.dump({"elapsed_s": time.perf_counter() - self._started_at, "stages": rows}, f, indent=2)
+        with open(output_dir / f"{name}.csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"📊 Latency report saved to {output_dir / name}.json/.csv")
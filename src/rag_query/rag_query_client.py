@@ -2,83 +2,276 @@ import os
 import base64
 import io
 import re
-from openai import OpenAI
-from neo4j import GraphDatabase
-from PIL import Image
-from dotenv import load_dotenv
-from pathlib import Path
-
-# --- Load Environment Variables ---
-env_path = Path('.') / 'config' / '.env'
-load_dotenv(dotenv_path=env_path)
+import time
+import threading
+from src.config import get_rag_config
+from src.graph.backends import create_backend
+from src.rag_query.rule_cache import RuleCache
+from src.rag_query.term_index import TermIndex
+from src.rag_query.image_cache import hash_file
+from src.rag_query.response_store import response_key
+from src.rag_query.metrics import PipelineMetrics
+from src.rag_query.request_policy import (
+    RequestPolicy, DeadlineExceeded, RequestCancelled, create_http_client, DEFAULT_MAX_CONNECTIONS
+)
 
 # --- Configuration Dictionary ---
-RAG_CONFIG = {
-    "NEO4J_URI": os.getenv("NEO4J_URI"),
-    "NEO4J_USER": os.getenv("NEO4J_USER"),
-    "NEO4J_PASSWORD": os.getenv("NEO4J_PASSWORD"),
-    "VLLM_API_URL": os.getenv("VLLM_API_URL"),
-    "VLLM_MODEL": os.getenv("VLLM_MODEL"),
+# RAG_CONFIG is resolved on first access (reading ./config/.env) rather than at import time;
+# openai and PIL are likewise imported only where they are used.
+def __getattr__(name):
+    if name == "RAG_CONFIG":
+        return get_rag_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def missing_config(config):
+    """Returns the names of the required settings that are not set for the selected backend."""
+    required = ["VLLM_API_URL", "VLLM_MODEL"]
+    if (config.get("KG_BACKEND") or "neo4j").lower() == "neo4j":
+        required += ["NEO4J_URI", "NEO4J_USER", "NEO4J_PASSWORD"]
+    else:
+        required += ["KG_SQLITE_PATH"]
+    return [key for key in required if not config.get(key)]
+
+# --- Per-Subset Generation Settings ---
+# With early stopping, the streamed completion is cancelled as soon as `stop_pattern`
+# matches the text received so far; `max_tokens` is the budget for each subset.
+YES_NO_ANSWER = re.compile(r'^\s*(?:answer:\s*)?(?:yes|no)(?=\W)|answer:\s*(?:yes|no)(?=\W)', re.IGNORECASE)
+FINAL_YES_NO_ANSWER = re.compile(r'answer:\s*(?:yes|no)(?=\W)', re.IGNORECASE)
+COMPONENT_NAME_LINE = re.compile(r'\S[^\n]*\n')
+
+SUBSET_GENERATION = {
+    'presence': {'max_tokens': 64, 'stop_pattern': YES_NO_ANSWER},
+    'definition': {'max_tokens': 32, 'stop_pattern': COMPONENT_NAME_LINE},
+    'dimension': {'max_tokens': 300, 'stop_pattern': FINAL_YES_NO_ANSWER},
+    'functional_performance': {'max_tokens': 300, 'stop_pattern': FINAL_YES_NO_ANSWER},
 }
+DEFAULT_GENERATION = {'max_tokens': 300, 'stop_pattern': None}
 
 class RAGQueryClient:
     """
     Handles the entire Retrieve-Augment-Generate pipeline for DesignQA.
     """
-    def __init__(self, config):
+    def __init__(self, config, use_cache=False, use_term_index=False, image_cache=None, response_store=None,
+                 metrics=None, backend=None, early_stop=False, generation=None, request_policy=None,
+                 max_connections=DEFAULT_MAX_CONNECTIONS, subtree_context=False):
         self.config = config
-        self.neo4j_driver = GraphDatabase.driver(
-            config["NEO4J_URI"], auth=(config["NEO4J_USER"], config["NEO4J_PASSWORD"])
-        )
-        self.vllm_client = OpenAI(api_key="EMPTY", base_url=config["VLLM_API_URL"])
+        # Give compliance questions the rule together with all of its sub-rules as context.
+        self.subtree_context = subtree_context
+        # Streaming early termination and per-subset token budgets (see SUBSET_GENERATION).
+        self.early_stop = early_stop
+        self.generation = generation if generation is not None else SUBSET_GENERATION
+        # Knowledge graph storage (Neo4j or embedded SQLite), see src.graph.backends.
+        self.backend = backend if backend is not None else create_backend(config)
+        # Deadlines, retries and hedging for inference calls; failures raise RequestFailure.
+        self.request_policy = request_policy if request_policy is not None else RequestPolicy()
+        from openai import OpenAI
+        # One tuned keep-alive pool for all threads; retries are done by the policy, not the SDK.
+        # Its request hook marks when the SDK has finished encoding a request (see query_compliance).
+        self._sent_at = threading.local()
+        self.http_client = create_http_client(max_connections, self.request_policy.attempt_timeout,
+                                              on_request=self._mark_sent)
+        self.vllm_client = OpenAI(api_key="EMPTY", base_url=config["VLLM_API_URL"], http_client=self.http_client,
+                                  max_retries=0, timeout=self.request_policy.attempt_timeout)
+        # Optional in-memory snapshot of all rules; see cache_stats()/refresh_cache().
+        self.rule_cache = RuleCache(self.backend) if use_cache else None
+        self.term_index = None
+        # Rules (None when missing) and term matches resolved up front by prefetch().
+        self._prefetched_rules = {}
+        self._prefetched_terms = {}
+        # Optional ImageCache with preprocessed base64 payloads keyed by content hash.
+        self.image_cache = image_cache
+        # Optional ResponseStore; identical requests are answered from disk instead of the server.
+        self.response_store = response_store
+        # Whether the last query_compliance call of the current thread was answered by the server or the store.
+        self._answer_source = threading.local()
+        # Per-stage latency recorder; a disabled one keeps the timing calls free when not needed.
+        self.metrics = metrics if metrics is not None else PipelineMetrics(enabled=False)
+        if use_term_index:
+            self.build_term_index()
         print("✅ RAGQueryClient initialized successfully.")
 
-    def _get_rule_from_kg(self, rule_id, question=""):
-        """Fetches a rule's full text and title from the Neo4j KG."""
+    def _fetch_rule(self, rule_id):
+        """Returns (title, text) for a rule, or None if it is not in the KG."""
+        if rule_id in self._prefetched_rules:
+            rule = self._prefetched_rules[rule_id]
+        elif self.rule_cache is not None:
+            rule = self.rule_cache.get(rule_id)
+        else:
+            rule = self.backend.get_rule(rule_id)
+        return (rule.title, rule.text) if rule else None
+
+    def _get_rule_from_kg(self, rule_id, question="", subset=None):
+        """Fetches a rule's full text and title from the KG."""
         if not rule_id:
             return "No rule specified."
-        with self.neo4j_driver.session() as session:
-            result = session.run(
-                "MATCH (n:Rule {rule_id: $rule_id}) RETURN n.text AS text, n.title AS title",
-                rule_id=rule_id
-            )
-            record = result.single()
-            if record:
-                title = record['title'] or ""
-                text = record['text'] or ""
-                # For 'retrieval' questions asking to "state exactly", return title and text.
-                if "state exactly" in question:
-                    return f"{title}\n{text}".strip() if title else text.strip()
-                # For compliance tasks, provide full context with the rule number.
-                return f"Rule {rule_id} ({title}):\n{text}".strip()
+        with self.metrics.timer("kg_lookup", subset):
+            rule = self._fetch_rule(rule_id)
+        if rule:
+            title = rule[0] or ""
+            text = rule[1] or ""
+            # For 'retrieval' questions asking to "state exactly", return title and text.
+            if "state exactly" in question:
+                return f"{title}\n{text}".strip() if title else text.strip()
+            # For compliance tasks, provide full context with the rule number.
+            return f"Rule {rule_id} ({title}):\n{text}".strip()
         return f"Rule {rule_id} was not found in the Knowledge Graph."
 
-    def _get_rules_by_term(self, term):
+    def _get_rule_subtree_from_kg(self, rule_id, subset=None):
+        """Fetches a rule and its whole subtree (one indexed prefix query) as compliance context."""
+        if not rule_id:
+            return "No rule specified."
+        with self.metrics.timer("kg_lookup", subset):
+            rules = self.backend.subtree(rule_id)
+        if not rules:
+            return f"Rule {rule_id} was not found in the Knowledge Graph."
+        return "\n".join(
+            f"Rule {sub_rule_id} ({rule.title or ''}):\n{rule.text or ''}".strip() for sub_rule_id, rule in rules
+        )
+
+    def prefetch(self, rule_ids=(), terms=(), subset=None):
+        """
+        Resolves the rules and terms of a whole subset before its rows are sent, with one
+        batched query each (see KnowledgeGraphBackend.get_rules/rules_by_terms), so the
+        per-row lookups are answered from memory. Rules already in the cache snapshot and
+        terms covered by the local term index are skipped.
+        """
+        snapshot = self.rule_cache.snapshot() if self.rule_cache is not None else {}
+        rule_ids = [rule_id for rule_id in dict.fromkeys(rule_ids)
+                    if rule_id and rule_id not in snapshot and rule_id not in self._prefetched_rules]
+        terms = [] if self.term_index is not None else [
+            term for term in dict.fromkeys(terms) if term and term not in self._prefetched_terms
+        ]
+        with self.metrics.timer("kg_prefetch", subset):
+            if rule_ids:
+                found = self.backend.get_rules(rule_ids)
+                self._prefetched_rules.update({rule_id: found.get(rule_id) for rule_id in rule_ids})
+            if terms:
+                self._prefetched_terms.update(
+                    {term: tuple(matches) for term, matches in self.backend.rules_by_terms(terms).items()}
+                )
+        return len(rule_ids), len(terms)
+
+    def refresh_cache(self, rule_id=None):
+        """Invalidates one cached (or prefetched) rule, or reloads the whole snapshot when `rule_id` is None."""
+        if rule_id is None:
+            self._prefetched_rules.clear()
+            self._prefetched_terms.clear()
+        else:
+            self._prefetched_rules.pop(rule_id, None)
+        if self.rule_cache is None:
+            return
+        if rule_id is None:
+            self.rule_cache.refresh()
+            if self.term_index is not None:
+                self.build_term_index()
+        else:
+            self.rule_cache.invalidate(rule_id)
+
+    def cache_stats(self):
+        """Returns the rule cache hit/miss counters (empty dict when caching is disabled)."""
+        return self.rule_cache.stats() if self.rule_cache is not None else {}
+
+    def build_term_index(self):
+        """(Re)builds the local inverted index used by _get_rules_by_term."""
+        snapshot = self.rule_cache.snapshot() if self.rule_cache is not None else self.backend.all_rules()
+        self.term_index = TermIndex.from_snapshot(snapshot)
+
+    def _get_rules_by_term(self, term, subset=None):
         """Finds all rules containing a specific term for the 'Compilation' task."""
         if not term: return ""
-        with self.neo4j_driver.session() as session:
-            result = session.run(
-                """
-                MATCH (r:Rule)
-                WHERE toLower(r.title) CONTAINS toLower($term) OR toLower(r.text) CONTAINS toLower($term)
-                RETURN r.rule_id AS rule_id ORDER BY r.rule_id
-                """,
-                term=term
-            )
-            return ",".join([record["rule_id"] for record in result])
+        with self.metrics.timer("kg_lookup", subset):
+            return self._search_rules_by_term(term)
+
+    def _search_rules_by_term(self, term):
+        if term in self._prefetched_terms:
+            return ",".join(self._prefetched_terms[term])
+        if self.term_index is not None:
+            return ",".join(self.term_index.search(term))
+        return ",".join(self.backend.rules_by_term(term))
 
     def _encode_image_to_base64(self, image_path):
         """Encodes an image file to a base64 string."""
+        if self.image_cache is not None:
+            return self.image_cache.get(image_path)
+        from PIL import Image
         with Image.open(image_path) as img:
             if img.mode != 'RGB': img = img.convert('RGB')
             buffered = io.BytesIO()
             img.save(buffered, format="JPEG")
             return base64.b64encode(buffered.getvalue()).decode('utf-8')
 
-    def query_compliance(self, question, image_path, rule_id):
-        """Orchestrates the full RAG pipeline for image-based tasks."""
-        rule_text = self._get_rule_from_kg(rule_id, question) if rule_id else ""
-        base64_image = self._encode_image_to_base64(image_path)
+    def _image_hash(self, image_path):
+        """Hash of the image payload as sent to the server, used in response cache keys."""
+        if self.image_cache is not None:
+            return self.image_cache.payload_key(image_path)
+        return hash_file(image_path)
+
+    def _build_messages(self, prompt_text, base64_image, preamble=None):
+        """
+        Builds the chat messages for one image question. Without a preamble the prompt text is
+        followed by the image (original layout). With a preamble the layout is prefix-first:
+        shared preamble, then the image, then the per-question text, so requests that share
+        the preamble and image share a prompt prefix the server can reuse from its KV cache.
+        """
+        image_part = {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+        if preamble is None:
+            content = [{"type": "text", "text": prompt_text}, image_part]
+        else:
+            content = [
+                {"type": "text", "text": preamble},
+                image_part,
+                {"type": "text", "text": prompt_text},
+            ]
+        return [{"role": "user", "content": content}]
+
+    def _mark_sent(self, request):
+        """http_client request hook: the request body is encoded and about to be sent."""
+        self._sent_at.value = time.perf_counter()
+
+    def _consume_stream(self, stream, start, stop_pattern=None, deadline=None, cancel=None):
+        """
+        Accumulates a streamed completion; returns (text, {stage: seconds}) with the attempt's
+        time to first token and, if it stopped early, time to the stop. When `stop_pattern`
+        matches the text received so far, the stream is closed (vLLM aborts the request once
+        the client disconnects) and the answer is cut at the end of the match. The stream is
+        also closed when the `deadline` (perf_counter time) passes or the `cancel` event is set.
+        """
+        text = ""
+        timings = {}
+        for chunk in stream:
+            if cancel is not None and cancel.is_set():
+                stream.close()
+                raise RequestCancelled("another attempt answered first")
+            if deadline is not None and time.perf_counter() > deadline:
+                stream.close()
+                raise DeadlineExceeded(f"stream still running after {deadline - start:.1f}s")
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            if not text:
+                timings["llm_ttft"] = time.perf_counter() - start
+            text += delta
+            if stop_pattern is not None:
+                match = stop_pattern.search(text)
+                if match:
+                    stream.close()
+                    timings["llm_early_stop"] = time.perf_counter() - start
+                    return text[:match.end()].rstrip(), timings
+        return text, timings
+
+    def query_compliance(self, question, image_path, rule_id, subset=None, preamble=None):
+        """
+        Orchestrates the full RAG pipeline for image-based tasks.
+        Raises RequestFailure when the server gives no answer within the request policy.
+        `preamble` is an optional leading part of `question` shared by many rows
+        (see shared_preamble); when given, the prefix-first message layout is used.
+        """
+        if not rule_id:
+            rule_text = ""
+        elif self.subtree_context:
+            rule_text = self._get_rule_subtree_from_kg(rule_id, subset)
+        else:
+            rule_text = self._get_rule_from_kg(rule_id, question, subset)
         
         few_shot_prompt = """
         Example of how to answer:
@@ -86,25 +279,94 @@ class RAGQueryClient:
         Answer: yes
         """
         
-        prompt_text = f"Query: {question}\n"
+        if preamble is not None and question.startswith(preamble):
+            prompt_text = f"{question[len(preamble):].lstrip()}\n"
+            preamble = f"Query: {preamble}"
+        else:
+            preamble = None
+            prompt_text = f"Query: {question}\n"
         if "Rule" in rule_text: prompt_text += f"Rule Context: {rule_text}\n"
         #prompt_text += f"Follow the output format of this example:\n{few_shot_prompt}"
 
-        try:
-            response = self.vllm_client.chat.completions.create(
+        sampling_params = {"max_tokens": 300, "temperature": 0.7}
+        stop_pattern = None
+        if self.early_stop:
+            settings = self.generation.get(subset, DEFAULT_GENERATION)
+            sampling_params["max_tokens"] = settings['max_tokens']
+            stop_pattern = settings['stop_pattern']
+        cache_key = None
+        if self.response_store is not None:
+            prompt_key = prompt_text if preamble is None else [preamble, prompt_text]
+            key_params = dict(sampling_params, stop_pattern=stop_pattern.pattern if stop_pattern else None)
+            cache_key = response_key(self.config["VLLM_MODEL"], prompt_key, self._image_hash(image_path), key_params)
+            cached = self.response_store.get_response(cache_key)
+            if cached is not None:
+                self._answer_source.value = "cache"
+                return cached
+
+        with self.metrics.timer("image_encoding", subset):
+            base64_image = self._encode_image_to_base64(image_path)
+        build_start = time.perf_counter()
+        messages = self._build_messages(prompt_text, base64_image, preamble)
+        build_seconds = time.perf_counter() - build_start
+
+        def _send(timeout, cancel):
+            # Streamed so time-to-first-token can be measured; the concatenated text is the same answer.
+            attempt_start = time.perf_counter()
+            self._sent_at.value = None
+            stream = self.vllm_client.chat.completions.create(
                 model=self.config["VLLM_MODEL"],
-                messages=[{
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt_text},
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                    ]
-                }],
-                max_tokens=300, temperature=0.7
+                messages=messages,
+                stream=True,
+                timeout=timeout,
+                **sampling_params
             )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"An error occurred while contacting the VLLM server: {e}"
+            # The SDK JSON-encodes the body inside create(); TTFT is counted from when it was sent.
+            sent_at = self._sent_at.value or attempt_start
+            text, timings = self._consume_stream(stream, sent_at, stop_pattern,
+                                                 deadline=attempt_start + timeout, cancel=cancel)
+            timings["request_serialization"] = sent_at - attempt_start
+            return text, timings
+
+        start = time.perf_counter()
+        self._answer_source.value = None
+        answer, timings = self.request_policy.call(_send)
+        self._answer_source.value = "server"
+        # Only the winning attempt's timings are kept; retried or out-raced attempts would skew TTFT.
+        timings["request_serialization"] += build_seconds
+        for stage, seconds in timings.items():
+            self.metrics.record(stage, seconds, subset)
+        self.metrics.record("llm_total", time.perf_counter() - start, subset)
+        if cache_key is not None:
+            self.response_store.put_response(cache_key, self.config["VLLM_MODEL"], answer)
+        return answer
+
+    def last_answer_source(self):
+        """'server' or 'cache' for the last query_compliance answer of the calling thread (None if it failed)."""
+        return getattr(self._answer_source, "value", None)
+
+    def request_stats(self):
+        """Counters of retries, hedged requests and error kinds seen by the request policy."""
+        return dict(self.request_policy.stats)
 
     def close(self):
-        self.neo4j_driver.close()
\ No newline at end of file
+        self.request_policy.close()
+        self.http_client.close()
+        self.backend.close()
+
+
+def shared_preamble(questions, min_length=40):
+    """
+    Longest common leading text of `questions`, cut back to the last sentence boundary
+    so the split never falls inside a sentence. Returns None when it is shorter than
+    `min_length` characters (too short to be worth a separate prefix).
+    """
+    questions = [q for q in questions if isinstance(q, str)]
+    if not questions:
+        return None
+    prefix = os.path.commonprefix(questions)
+    cut = prefix.rfind('. ')
+    if cut < 0:
+        return None
+    prefix = prefix[:cut + 1]
+    return prefix if len(prefix) >= min_length else None
\ No newline at end of file
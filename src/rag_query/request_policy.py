@@ -0,0 +1,182 @@
+import time
+import random
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from src.rag_query.metrics import percentile
+
+# --- Defaults for inference calls against the VLLM server ---
+# Total budget for one question (all attempts and backoff included).
+DEFAULT_DEADLINE = 180.0
+# Upper bound for a single attempt; a stalled attempt is abandoned and retried after this.
+DEFAULT_ATTEMPT_TIMEOUT = 60.0
+DEFAULT_MAX_ATTEMPTS = 3
+# Full-jitter exponential backoff: sleep uniform(0, min(cap, base * 2**(attempt - 1))).
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_CAP = 8.0
+# Hedging: once `min_samples` latencies are known, an attempt still running after the
+# `hedge_percentile` latency gets a duplicate request; the first answer wins.
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 500
+# Pooled keep-alive connections shared by every request of a client.
+DEFAULT_MAX_CONNECTIONS = 64
+CONNECT_TIMEOUT = 5.0
+
+# Error kinds worth another attempt; anything else (bad request, auth, ...) fails immediately.
+TRANSIENT_KINDS = {"timeout", "connection", "rate_limit", "server_error"}
+
+
+class RequestFailure(Exception):
+    """A question that could not be answered; stored as a structured error row instead of a prediction."""
+    def __init__(self, kind, message, attempts=0, elapsed=0.0):
+        super().__init__(f"{kind}: {message}")
+        self.kind = kind
+        self.message = message
+        self.attempts = attempts
+        self.elapsed = elapsed
+
+    def as_row(self):
+        return {"error_kind": self.kind, "error_message": self.message,
+                "attempts": self.attempts, "elapsed_s": round(self.elapsed, 3)}
+
+
+class DeadlineExceeded(Exception):
+    """Raised while streaming when the attempt runs past its timeout."""
+
+
+class RequestCancelled(Exception):
+    """Raised in the losing attempt of a hedged pair once the other one has answered."""
+
+
+def classify_error(exc):
+    """Maps an exception raised by an inference attempt to an error kind (see TRANSIENT_KINDS)."""
+    import httpx
+    import openai
+
+    if isinstance(exc, DeadlineExceeded):
+        return "timeout"
+    if isinstance(exc, RequestCancelled):
+        return "cancelled"
+    if isinstance(exc, (openai.APITimeoutError, httpx.TimeoutException)):
+        return "timeout"
+    if isinstance(exc, (openai.APIConnectionError, httpx.TransportError)):
+        return "connection"
+    if isinstance(exc, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(exc, openai.InternalServerError):
+        return "server_error"
+    if isinstance(exc, openai.APIStatusError):
+        return f"http_{exc.status_code}"
+    return "error"
+
+
+def create_http_client(max_connections=DEFAULT_MAX_CONNECTIONS, attempt_timeout=DEFAULT_ATTEMPT_TIMEOUT,
+                       on_request=None):
+    """
+    One keep-alive connection pool shared by all threads, sized for the number of requests in flight.
+    `on_request(request)` is called on the sending thread once a request is built, right before it is sent.
+    """
+    import httpx
+
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                            keepalive_expiry=60.0),
+        timeout=httpx.Timeout(attempt_timeout, connect=CONNECT_TIMEOUT),
+        event_hooks={"request": [on_request] if on_request is not None else [], "response": []},
+    )
+
+
+class RequestPolicy:
+    """
+    Deadline, retry and hedging policy for inference calls.
+    `call(send)` runs `send(timeout, cancel)` - which must give up after `timeout` seconds
+    and stop early once the `cancel` event is set - until it answers, the error is not
+    transient, the attempts are used up or the deadline has passed.
+    """
+    def __init__(self, deadline=DEFAULT_DEADLINE, attempt_timeout=DEFAULT_ATTEMPT_TIMEOUT,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, backoff_base=DEFAULT_BACKOFF_BASE,
+                 backoff_cap=DEFAULT_BACKOFF_CAP, hedge=False, hedge_percentile=DEFAULT_HEDGE_PERCENTILE,
+                 hedge_min_samples=DEFAULT_HEDGE_MIN_SAMPLES, hedge_workers=DEFAULT_MAX_CONNECTIONS):
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.stats = Counter()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=hedge_workers) if hedge else None
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** (attempt - 1)))
+
+    def hedge_delay(self):
+        """Seconds after which a duplicate request is sent, or None while hedging is off or unprimed."""
+        if not self.hedge:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            return percentile(sorted(self._latencies), self.hedge_percentile)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def call(self, send):
+        start = time.perf_counter()
+        deadline_at = start + self.deadline
+        for attempt in range(1, self.max_attempts + 1):
+            timeout = min(self.attempt_timeout, deadline_at - time.perf_counter())
+            if timeout <= 0:
+                self._count("deadline_exceeded")
+                raise RequestFailure("deadline", f"no answer within {self.deadline:.0f}s",
+                                     attempt - 1, time.perf_counter() - start)
+            attempt_start = time.perf_counter()
+            try:
+                answer = self._attempt(send, timeout)
+            except Exception as e:
+                kind = classify_error(e)
+                self._count(kind)
+                elapsed = time.perf_counter() - start
+                if kind not in TRANSIENT_KINDS or attempt == self.max_attempts:
+                    raise RequestFailure(kind, str(e) or type(e).__name__, attempt, elapsed) from e
+                self._count("retries")
+                time.sleep(max(0.0, min(self.backoff(attempt), deadline_at - time.perf_counter())))
+                continue
+            with self._lock:
+                self._latencies.append(time.perf_counter() - attempt_start)
+            return answer
+
+    def _attempt(self, send, timeout):
+        delay = self.hedge_delay()
+        if delay is None or delay >= timeout:
+            return send(timeout, threading.Event())
+
+        cancels = (threading.Event(), threading.Event())
+        primary = self._executor.submit(send, timeout, cancels[0])
+        if wait([primary], timeout=delay).done:
+            return primary.result()
+
+        # --- The primary is slower than the hedge percentile: race a duplicate against it ---
+        self._count("hedged")
+        hedged = self._executor.submit(send, timeout - delay, cancels[1])
+        racers = {primary: 0, hedged: 1}
+        pending = set(racers)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    cancels[1 - racers[future]].set()
+                    if future is hedged:
+                        self._count("hedge_wins")
+                    return future.result()
+        raise primary.exception()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
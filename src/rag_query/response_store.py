@@ -0,0 +1,85 @@
+import json
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+
+DEFAULT_STORE_PATH = Path('.') / '.cache' / 'responses.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    cache_key TEXT PRIMARY KEY,
+    model TEXT,
+    response TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    subset TEXT,
+    row_index INTEGER,
+    question TEXT,
+    prediction TEXT,
+    PRIMARY KEY (subset, row_index)
+);
+"""
+
+
+def response_key(model, prompt_text, image_hash, sampling_params):
+    """Deterministic cache key for one chat completion request."""
+    payload = json.dumps([model, prompt_text, image_hash, sampling_params], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseStore:
+    """
+    SQLite-backed store for benchmark runs, with two tables:
+    - responses: LLM completions keyed by (model, prompt text, image hash, sampling params),
+      so unchanged requests are never sent to the server twice.
+    - predictions: per-row checkpoints written as soon as a row finishes, used by --resume.
+    """
+    def __init__(self, db_path=DEFAULT_STORE_PATH):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # One shared connection guarded by a lock; rows are written from the worker threads.
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def get_response(self, cache_key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE cache_key = ?", (cache_key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_response(self, cache_key, model, response):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (cache_key, model, response) VALUES (?, ?, ?)",
+                (cache_key, model, response)
+            )
+
+    def record_prediction(self, subset, row_index, question, prediction):
+        """Checkpoints one finished row."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO predictions (subset, row_index, question, prediction) VALUES (?, ?, ?, ?)",
+                (subset, int(row_index), question, prediction)
+            )
+
+    def load_predictions(self, subset):
+        """Returns {row_index: (question, prediction)} for the rows already answered in `subset`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT row_index, question, prediction FROM predictions WHERE subset = ?", (subset,)
+            ).fetchall()
+        return {row_index: (question, prediction) for row_index, question, prediction in rows}
+
+    def clear_predictions(self, subset):
+        """Forgets the checkpoints of `subset` (cached responses are kept)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM predictions WHERE subset = ?", (subset,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+
+
+class RuleCache:
+    """
+    In-process snapshot of the Rule nodes used by RAGQueryClient.
+    The full rule set is bulk-loaded once from the knowledge graph backend; lookups
+    that miss the snapshot (e.g. rules added after loading) fall back to a single-rule
+    query whose result, including "not found", is kept in a bounded LRU.
+    """
+    def __init__(self, backend, lru_size=1024):
+        self.backend = backend
+        self.lru_size = lru_size
+        self.hits = 0
+        self.misses = 0
+        self._snapshot = {}
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """Reloads the snapshot from the graph and clears the miss LRU."""
+        snapshot = self.backend.all_rules()
+        with self._lock:
+            self._snapshot = snapshot
+            self._lru.clear()
+        print(f" Rule cache loaded {len(snapshot)} rules.")
+
+    def snapshot(self):
+        """Returns the current {rule_id: RuleRecord} snapshot."""
+        with self._lock:
+            return dict(self._snapshot)
+
+    def invalidate(self, rule_id=None):
+        """Drops one rule (or everything when `rule_id` is None) so the next lookup re-queries the graph."""
+        with self._lock:
+            if rule_id is None:
+                self._snapshot = {}
+                self._lru.clear()
+            else:
+                self._snapshot.pop(rule_id, None)
+                self._lru.pop(rule_id, None)
+
+    def get(self, rule_id):
+        """Returns the RuleRecord for `rule_id`, or None if the rule does not exist."""
+        with self._lock:
+            if rule_id in self._snapshot:
+                self.hits += 1
+                return self._snapshot[rule_id]
+            if rule_id in self._lru:
+                self.hits += 1
+                self._lru.move_to_end(rule_id)
+                return self._lru[rule_id]
+            self.misses += 1
+
+        rule = self.backend.get_rule(rule_id)
+        with self._lock:
+            self._lru[rule_id] = rule
+            if len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+        return rule
+
+    def stats(self):
+        """Returns hit/miss counters and current sizes."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "snapshot_size": len(self._snapshot),
+                "lru_size": len(self._lru),
+            }
@@ -0,0 +1,56 @@
+import bisect
+from functools import lru_cache
+from src.graph.backends import tokenize, term_alternatives, term_matches, union_in_rule_order
+
+
+class TermIndex:
+    """
+    Inverted index (token -> rule_ids) over rule titles and texts for the 'Compilation' task.
+    A query token matches every indexed token it is a prefix of, so 'aerodynamic' also
+    finds 'aerodynamics'. The postings of all words of a term are intersected and the
+    candidates verified with term_matches (the semantics every backend shares), and
+    slash-separated alternatives ('Aerodynamic/Aerodynamics') are a union.
+    """
+    def __init__(self, rules):
+        postings = {}
+        self._documents = {}
+        for rule_id, title, text in rules:
+            tokens = tokenize(title) + tokenize(text)
+            self._documents[rule_id] = (title, text)
+            for token in set(tokens):
+                postings.setdefault(token, set()).add(rule_id)
+        self._vocabulary = sorted(postings)
+        self._postings = postings
+        # Memoized per instance; compilation questions repeat the same terms.
+        self.search = lru_cache(maxsize=4096)(self._search)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Builds the index from a {rule_id: RuleRecord} snapshot (see KnowledgeGraphBackend.all_rules)."""
+        return cls((rule_id, rule.title, rule.text) for rule_id, rule in snapshot.items())
+
+    def _prefix_postings(self, token):
+        """Union of the postings of every vocabulary token starting with `token`."""
+        matches = set()
+        start = bisect.bisect_left(self._vocabulary, token)
+        for vocab_token in self._vocabulary[start:]:
+            if not vocab_token.startswith(token):
+                break
+            matches |= self._postings[vocab_token]
+        return matches
+
+    def _search_alternative(self, alternative):
+        tokens = tokenize(alternative)
+        if not tokens:
+            return set()
+        candidates = self._prefix_postings(tokens[0])
+        for token in tokens[1:]:
+            if not candidates:
+                break
+            candidates &= self._prefix_postings(token)
+        return {rule_id for rule_id in candidates if term_matches(alternative, *self._documents[rule_id])}
+
+    def _search(self, term):
+        """Returns the rule_ids (in rule order) matching any slash-separated alternative of `term`."""
+        return tuple(union_in_rule_order(self._search_alternative(alternative)
+                                         for alternative in term_alternatives(term)))